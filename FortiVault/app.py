@@ -1,17 +1,42 @@
 import streamlit as st
-from database import get_db_connection
+from database import initialize_database, pooled_connection
 from security import (
     hash_master_password,
     verify_master_password,
+    password_needs_rehash,
     encrypt_data,
     decrypt_data,
-    generate_key_from_password
+    generate_key_from_password,
+    generate_legacy_key,
+    get_cipher,
+    new_kdf_settings,
+    parse_kdf_params,
+    rotation_cipher,
+    ServerBusyError
 )
+from password_tools.audit import AuditCache, audit_vault
+from vault_io import ImportFormatError, export_entries, import_entries, reencrypt_entries
+from metrics import start_metrics_server
 import os
+import tempfile
 
 # Page configuration
 st.set_page_config(page_title="Password Manager", layout="wide")
 
+PAGE_SIZES = (10, 25, 50, 100)
+
+@st.cache_resource
+def bootstrap_database():
+    initialize_database()
+
+@st.cache_resource
+def bootstrap_metrics():
+    # No-op unless FORTIVAULT_METRICS=1
+    start_metrics_server()
+
+bootstrap_database()
+bootstrap_metrics()
+
 # Session state initialization
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -19,6 +44,43 @@ if 'master_key' not in st.session_state:
     st.session_state.master_key = None
 if 'user_id' not in st.session_state:
     st.session_state.user_id = None
+if 'cipher' not in st.session_state:
+    st.session_state.cipher = None
+if 'page_cursors' not in st.session_state:
+    st.session_state.page_cursors = [0]  # password_id each visited page starts after
+if 'vault_search' not in st.session_state:
+    st.session_state.vault_search = ""
+if 'audit_cache' not in st.session_state:
+    st.session_state.audit_cache = AuditCache()
+
+def derive_vault_key(user_id, password, kdf_salt, kdf_params):
+    """
+    Vault key from the user's stored salt and Argon2 cost. Accounts without
+    them still use the legacy shared key: give them their own settings and
+    re-encrypt the vault in the same transaction
+    """
+    if kdf_salt is not None:
+        return generate_key_from_password(password, bytes(kdf_salt), parse_kdf_params(kdf_params))
+    
+    salt, params = new_kdf_settings()
+    master_key = generate_key_from_password(password, salt, parse_kdf_params(params))
+    legacy_key = generate_legacy_key(password)
+    with pooled_connection('kdf_upgrade') as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT kdf_salt, kdf_params FROM users WHERE user_id = %s FOR UPDATE",
+            (user_id,)
+        )
+        stored_salt, stored_params = cur.fetchone()
+        if stored_salt is None:
+            cur.execute(
+                "UPDATE users SET kdf_salt = %s, kdf_params = %s WHERE user_id = %s",
+                (salt, params, user_id)
+            )
+            reencrypt_entries(cur, user_id, rotation_cipher(master_key, legacy_key))
+            return master_key
+    # Another session migrated this account first
+    return generate_key_from_password(password, bytes(stored_salt), parse_kdf_params(stored_params))
 
 def login_page():
     st.title("Password Manager Login")
@@ -29,20 +91,38 @@ def login_page():
         submit_button = st.form_submit_button("Login")
         
         if submit_button:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT user_id, master_password_hash FROM users WHERE username = %s", 
-                (username,)
-            )
-            result = cur.fetchone()
+            with pooled_connection('login_lookup') as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """SELECT user_id, master_password_hash, kdf_salt, kdf_params
+                    FROM users WHERE username = %s""", 
+                    (username,)
+                )
+                result = cur.fetchone()
             
             if result:
-                user_id, stored_hash = result
-                if verify_master_password(password, stored_hash):
-                    # Generate encryption key from password
-                    salt = os.urandom(16)
-                    st.session_state.master_key = generate_key_from_password(password, salt)
+                user_id, stored_hash, kdf_salt, kdf_params = result
+                try:
+                    verified = verify_master_password(password, stored_hash)
+                    if verified:
+                        # Upgrade hashes made with stale Argon2 parameters
+                        if password_needs_rehash(stored_hash):
+                            new_hash, _ = hash_master_password(password)
+                            with pooled_connection('rehash_update') as conn:
+                                cur = conn.cursor()
+                                cur.execute(
+                                    "UPDATE users SET master_password_hash = %s WHERE user_id = %s",
+                                    (new_hash, user_id)
+                                )
+                        # Generate encryption key from password
+                        master_key = derive_vault_key(user_id, password, kdf_salt, kdf_params)
+                except ServerBusyError as e:
+                    st.error(str(e))
+                    return
+                
+                if verified:
+                    st.session_state.master_key = master_key
+                    st.session_state.cipher = get_cipher(master_key)
                     st.session_state.authenticated = True
                     st.session_state.user_id = user_id
                     st.success("Login successful!")
@@ -51,7 +131,6 @@ def login_page():
                     st.error("Incorrect password")
             else:
                 st.error("Username not found")
-            conn.close()
 
 def register_page():
     st.title("Register New User")
@@ -67,25 +146,31 @@ def register_page():
                 st.error("Passwords don't match")
                 return
                 
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            # Check if username exists
-            cur.execute("SELECT username FROM users WHERE username = %s", (username,))
-            if cur.fetchone():
-                st.error("Username already exists")
-                conn.close()
+            # Hash before checking out a connection so a queued hash
+            # does not hold a pooled connection
+            try:
+                kdf_salt, kdf_params = new_kdf_settings()
+                hashed_password, _ = hash_master_password(password)
+            except ServerBusyError as e:
+                st.error(str(e))
                 return
+            
+            with pooled_connection('register') as conn:
+                cur = conn.cursor()
                 
-            # Hash password and store
-            hashed_password, _ = hash_master_password(password)
-            cur.execute(
-                "INSERT INTO users (username, master_password_hash) VALUES (%s, %s) RETURNING user_id",
-                (username, hashed_password)
-            )
-            user_id = cur.fetchone()[0]
-            conn.commit()
-            conn.close()
+                # Check if username exists
+                cur.execute("SELECT username FROM users WHERE username = %s", (username,))
+                if cur.fetchone():
+                    st.error("Username already exists")
+                    return
+                    
+                # Store the hash
+                cur.execute(
+                    """INSERT INTO users (username, master_password_hash, kdf_salt, kdf_params)
+                    VALUES (%s, %s, %s, %s) RETURNING user_id""",
+                    (username, hashed_password, kdf_salt, kdf_params)
+                )
+                user_id = cur.fetchone()[0]
             
             st.success("Registration successful! Please login.")
 
@@ -103,46 +188,162 @@ def password_manager_page():
             submit_button = st.form_submit_button("Save Password")
             
             if submit_button:
-                encrypted_password = encrypt_data(password, st.session_state.master_key)
-                conn = get_db_connection()
-                cur = conn.cursor()
-                cur.execute(
-                    """INSERT INTO passwords 
-                    (user_id, service_name, username, encrypted_password, url, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s)""",
-                    (st.session_state.user_id, service, username, encrypted_password, url, notes)
-                )
-                conn.commit()
-                conn.close()
+                encrypted_password = encrypt_data(password, st.session_state.cipher)
+                with pooled_connection('add_password') as conn:
+                    cur = conn.cursor()
+                    cur.execute(
+                        """INSERT INTO passwords 
+                        (user_id, service_name, username, encrypted_password, url, notes)
+                        VALUES (%s, %s, %s, %s, %s, %s)""",
+                        (st.session_state.user_id, service, username, encrypted_password, url, notes)
+                    )
                 st.success("Password saved successfully!")
     
+    vault_health_section()
+    import_export_section()
+    
     # View passwords
     st.subheader("Your Saved Passwords")
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT password_id, service_name, username, encrypted_password, url, notes 
-        FROM passwords WHERE user_id = %s""",
-        (st.session_state.user_id,)
-    )
-    passwords = cur.fetchall()
-    conn.close()
+    search_col, size_col = st.columns([3, 1])
+    with search_col:
+        search = st.text_input("Search by service", placeholder="Service name starts with...").strip()
+    with size_col:
+        page_size = st.selectbox("Per page", PAGE_SIZES, index=1)
+    
+    if search != st.session_state.vault_search:
+        st.session_state.vault_search = search
+        st.session_state.page_cursors = [0]
+    
+    after_id = st.session_state.page_cursors[-1]
+    passwords, has_next = load_password_page(st.session_state.user_id, after_id, page_size, search)
+    
+    if not passwords:
+        st.info("No saved passwords match." if search else "No saved passwords yet.")
     
     for pwd in passwords:
         pwd_id, service, username, encrypted_pwd, url, notes = pwd
         with st.expander(f"{service} - {username}"):
-            decrypted_pwd = decrypt_data(encrypted_pwd, st.session_state.master_key)
-            st.text_input("Password", value=decrypted_pwd, type="password", key=f"pwd_{pwd_id}")
+            # Decrypt only when the user asks to see this entry
+            if st.checkbox("Reveal password", key=f"show_{pwd_id}"):
+                decrypted_pwd = decrypt_data(encrypted_pwd, st.session_state.cipher)
+                st.text_input("Password", value=decrypted_pwd, type="password", key=f"pwd_{pwd_id}")
             st.text(f"URL: {url}" if url else "No URL provided")
             st.text(f"Notes: {notes}" if notes else "No notes")
             
             if st.button("Delete", key=f"del_{pwd_id}"):
-                conn = get_db_connection()
-                cur = conn.cursor()
-                cur.execute("DELETE FROM passwords WHERE password_id = %s", (pwd_id,))
-                conn.commit()
-                conn.close()
+                with pooled_connection('delete_password') as conn:
+                    cur = conn.cursor()
+                    cur.execute("DELETE FROM passwords WHERE password_id = %s", (pwd_id,))
                 st.rerun()
+    
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("Previous", disabled=len(st.session_state.page_cursors) == 1):
+            st.session_state.page_cursors.pop()
+            st.rerun()
+    with page_col:
+        st.caption(f"Page {len(st.session_state.page_cursors)}")
+    with next_col:
+        if st.button("Next", disabled=not has_next):
+            st.session_state.page_cursors.append(passwords[-1][0])
+            st.rerun()
+
+def vault_health_section():
+    with st.expander("Vault Health"):
+        st.write("Check every saved password for weakness, reuse and known breaches.")
+        if not st.button("Run audit"):
+            return
+        
+        with pooled_connection('vault_audit') as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """SELECT password_id, service_name, username, encrypted_password
+                FROM passwords WHERE user_id = %s ORDER BY password_id""",
+                (st.session_state.user_id,)
+            )
+            entries = cur.fetchall()
+        
+        with st.spinner(f"Auditing {len(entries)} entries..."):
+            report = audit_vault(entries, st.session_state.cipher, st.session_state.audit_cache)
+        
+        weak = sum(r['weak'] for r in report)
+        reused = sum(r['reused'] for r in report)
+        breached = sum(r['breached'] for r in report)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Weak", weak)
+        col2.metric("Reused", reused)
+        col3.metric("Breached", breached)
+        
+        flagged = [
+            {
+                'Service': r['service'],
+                'Username': r['username'],
+                'Strength (0-4)': r['score'],
+                'Reused by': r['reuse_count'] if r['reused'] else '',
+                'Breaches': r['breaches'] if r['breaches'] >= 0 else 'unknown',
+                'Warning': r['warning'],
+            }
+            for r in report if r['weak'] or r['reused'] or r['breached']
+        ]
+        if flagged:
+            st.dataframe(flagged, use_container_width=True, hide_index=True)
+        else:
+            st.success("No weak, reused or breached passwords found.")
+
+def import_export_section():
+    with st.expander("Import / Export"):
+        uploaded = st.file_uploader(
+            "Import from CSV, JSON Lines or JSON (Chrome, Bitwarden, LastPass, ... exports)",
+            type=['csv', 'jsonl', 'json']
+        )
+        if uploaded is not None and st.button("Import"):
+            fmt = uploaded.name.rsplit('.', 1)[-1].lower()
+            try:
+                with st.spinner("Importing..."):
+                    count = import_entries(uploaded, fmt, st.session_state.user_id, st.session_state.cipher)
+                st.success(f"Imported {count} entries.")
+            except (ImportFormatError, ValueError) as e:
+                st.error(f"Import failed, nothing was saved: {e}")
+        
+        st.markdown("---")
+        export_format = st.selectbox("Export format", ['csv', 'jsonl'])
+        if st.button("Prepare encrypted export"):
+            # Rows are streamed to a temporary file rather than built up in
+            # memory. download_button only accepts plain file types, so the
+            # file is reopened read-only; it reads the data during the call
+            with tempfile.NamedTemporaryFile(suffix=f".{export_format}", delete=False) as export_file:
+                count = export_entries(st.session_state.user_id, export_format, export_file)
+            try:
+                with open(export_file.name, 'rb') as data:
+                    st.download_button(
+                        f"Download {count} entries",
+                        data=data,
+                        file_name=f"fortivault-export.{export_format}",
+                        mime='text/csv' if export_format == 'csv' else 'application/x-ndjson'
+                    )
+            finally:
+                os.remove(export_file.name)
+
+def load_password_page(user_id, after_id, page_size, search=""):
+    """
+    Keyset-paginated vault listing. Fetches one extra row to learn whether
+    a next page exists. Returns (rows, has_next)
+    """
+    sql = """SELECT password_id, service_name, username, encrypted_password, url, notes 
+        FROM passwords WHERE user_id = %s AND password_id > %s"""
+    params = [user_id, after_id]
+    if search:
+        escaped = search.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        sql += " AND lower(service_name) LIKE %s"
+        params.append(escaped + '%')
+    sql += " ORDER BY password_id LIMIT %s"
+    params.append(page_size + 1)
+    
+    with pooled_connection('vault_page') as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    return rows[:page_size], len(rows) > page_size
 
 # Main app flow
 if not st.session_state.authenticated:
@@ -156,5 +357,10 @@ else:
     if st.button("Logout"):
         st.session_state.authenticated = False
         st.session_state.master_key = None
+        st.session_state.cipher = None
         st.session_state.user_id = None
+        st.session_state.audit_cache = AuditCache()
+        # Paging state belongs to the old user; a stale cursor would skip entries
+        st.session_state.page_cursors = [0]
+        st.session_state.vault_search = ""
         st.rerun()
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Decrypting a 1,000-entry vault: per-call Fernet construction vs. the
+session cipher and decrypt_many.
+
+Run: python benchmarks/bench_cipher.py [entries] [repeats]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet  # noqa: E402
+from security import decrypt_many, encrypt_data, get_cipher  # noqa: E402
+
+
+def _decrypt_rebuilding_cipher(tokens, key):
+    return [Fernet(key).decrypt(token.encode()).decode() for token in tokens]
+
+
+if __name__ == '__main__':
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    key = Fernet.generate_key()
+    cipher = get_cipher(key)
+    tokens = [encrypt_data(f"password-{i:06d}", cipher) for i in range(entries)]
+
+    cases = {
+        "Fernet(key) per entry": lambda: _decrypt_rebuilding_cipher(tokens, key),
+        "decrypt_many(cipher)": lambda: decrypt_many(tokens, cipher),
+    }
+    for label, fn in cases.items():
+        best = min(timeit.repeat(fn, number=1, repeat=repeats))
+        print(f"{label:<24} {best * 1000:8.2f} ms / {entries} entries "
+              f"({best / entries * 1e6:6.2f} us each)")
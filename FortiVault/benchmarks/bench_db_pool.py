@@ -0,0 +1,54 @@
+"""
+Per-request latency: fresh connection per query vs. the shared pool.
+
+Needs the same DB_* environment variables as the app.
+Run: python benchmarks/bench_db_pool.py [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_db_connection, pooled_connection  # noqa: E402
+
+QUERY = "SELECT user_id, master_password_hash FROM users WHERE username = %s"
+
+
+def _unpooled():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(QUERY, ('benchmark-user',))
+    cur.fetchone()
+    conn.close()
+
+
+def _pooled():
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(QUERY, ('benchmark-user',))
+        cur.fetchone()
+
+
+def _measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<22} mean {statistics.mean(samples):7.2f} ms   "
+          f"p50 {statistics.median(samples):7.2f} ms   p99 {p99:7.2f} ms")
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _pooled()  # warm the pool so the first checkout is not counted
+    _report("connect per query", _measure(_unpooled, iterations))
+    _report("pooled connection", _measure(_pooled, iterations))
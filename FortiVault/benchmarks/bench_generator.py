@@ -0,0 +1,28 @@
+"""
+Password generation throughput: generate_password in a loop vs. generate_passwords.
+
+Run: python benchmarks/bench_generator.py [count] [length]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_tools.generator import generate_password, generate_passwords  # noqa: E402
+
+
+def _rate(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    loop_rate = _rate(lambda: [generate_password(length) for _ in range(count)], count)
+    batch_rate = _rate(lambda: generate_passwords(count, length), count)
+    print(f"generate_password loop  {loop_rate:12,.0f} passwords/s")
+    print(f"generate_passwords      {batch_rate:12,.0f} passwords/s")
@@ -0,0 +1,52 @@
+"""
+Bulk import throughput: a generated N-entry CSV imported into a throwaway user.
+The user and its entries are deleted afterwards.
+
+Needs the same DB_* environment variables as the app.
+Run: python benchmarks/bench_import.py [entries]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet  # noqa: E402
+from database import pooled_connection  # noqa: E402
+from vault_io import export_entries, import_entries  # noqa: E402
+
+
+def _make_csv(entries):
+    lines = ["name,url,username,password"]
+    lines += [f"service-{i},https://example.com/{i},user{i},secret-{i:08d}" for i in range(entries)]
+    return io.BytesIO("\n".join(lines).encode())
+
+
+if __name__ == '__main__':
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cipher = Fernet(Fernet.generate_key())
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO users (username, master_password_hash) VALUES (%s, %s) RETURNING user_id",
+            (f"bench-import-{os.getpid()}", "not-a-hash")
+        )
+        user_id = cur.fetchone()[0]
+
+    try:
+        start = time.perf_counter()
+        imported = import_entries(_make_csv(entries), 'csv', user_id, cipher)
+        elapsed = time.perf_counter() - start
+        print(f"import  {imported} entries in {elapsed:6.2f} s ({imported / elapsed:,.0f} entries/s)")
+
+        start = time.perf_counter()
+        exported = export_entries(user_id, 'csv', io.BytesIO())
+        elapsed = time.perf_counter() - start
+        print(f"export  {exported} entries in {elapsed:6.2f} s ({exported / elapsed:,.0f} entries/s)")
+    finally:
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM passwords WHERE user_id = %s", (user_id,))
+            cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
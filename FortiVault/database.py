@@ -1,11 +1,33 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
 from dotenv import load_dotenv
 
+import metrics
+
 load_dotenv()
 
-def get_db_connection():
-    return psycopg2.connect(
+# =============================================
+# Pool Configuration
+# =============================================
+POOL_PARAMS = {
+    'min_size': int(os.getenv('DB_POOL_MIN', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+    'checkout_timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),  # seconds
+    'health_check_after': float(os.getenv('DB_POOL_HEALTHCHECK', 30)),  # idle seconds
+}
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no pooled connection frees up within the checkout timeout"""
+
+
+def _connection_params() -> dict:
+    return dict(
         host=os.getenv('DB_HOST'),
         database=os.getenv('DB_NAME'),
         user=os.getenv('DB_USER'),
@@ -13,7 +35,217 @@ def get_db_connection():
         port=os.getenv('DB_PORT')
     )
 
-def initialize_database():
-    conn = get_db_connection()
-    # Create tables if they don't exist
-    conn.close()
\ No newline at end of file
+
+def get_db_connection():
+    """Open a dedicated (unpooled) connection. Caller must close it."""
+    return psycopg2.connect(**_connection_params())
+
+
+# =============================================
+# Connection Pool
+# =============================================
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL pool shared by every Streamlit session in the process.
+
+    psycopg2's ThreadedConnectionPool raises as soon as max_size connections
+    are out; the semaphore makes callers wait up to checkout_timeout instead.
+    Connections idle longer than health_check_after are pinged before reuse.
+    """
+
+    def __init__(self, min_size: int, max_size: int, checkout_timeout: float,
+                 health_check_after: float):
+        self._pool = pg_pool.ThreadedConnectionPool(
+            min_size, max_size, **_connection_params()
+        )
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._checkout_timeout = checkout_timeout
+        self._health_check_after = health_check_after
+        self._last_used = {}
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self._health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        if not self._is_healthy(conn):
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        return conn
+
+    def _release(self, conn, broken: bool = False):
+        if broken or conn.closed:
+            self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commit on success, roll back on error."""
+        wait_started = time.perf_counter()
+        if not self._slots.acquire(timeout=self._checkout_timeout):
+            metrics.inc('fortivault_db_checkout_timeouts_total')
+            raise PoolExhaustedError("Timed out waiting for a database connection")
+        metrics.observe('fortivault_db_checkout_wait_seconds', time.perf_counter() - wait_started)
+        try:
+            conn = self._checkout()
+            broken = False
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                broken = conn.closed
+                if not broken:
+                    conn.rollback()
+                raise
+            finally:
+                self._release(conn, broken)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**POOL_PARAMS)
+    return _pool
+
+
+@contextmanager
+def pooled_connection(query: str = 'other'):
+    """
+    Usage:
+        with pooled_connection('login_lookup') as conn:
+            cur = conn.cursor()
+            ...
+    `query` labels the fortivault_db_query_seconds metric, which times the
+    whole block: checkout, statements and commit.
+    """
+    with metrics.track('fortivault_db_query_seconds', query=query):
+        with get_pool().connection() as conn:
+            yield conn
+
+
+# =============================================
+# Schema Migrations
+# =============================================
+# Applied in order, each exactly once, and recorded in schema_migrations.
+# Statements are idempotent so databases whose tables were created by hand
+# (per the README) are adopted rather than rejected. Append new versions;
+# never edit one that has shipped.
+MIGRATIONS = (
+    (1, "users and passwords tables", (
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id SERIAL PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            master_password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS passwords (
+            password_id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            service_name VARCHAR(255) NOT NULL,
+            username VARCHAR(255) NOT NULL,
+            encrypted_password TEXT NOT NULL,
+            url VARCHAR(255),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    )),
+    (2, "login and vault lookup indexes", (
+        # Skip when a hand-made schema already has UNIQUE (username)
+        """DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index i
+                JOIN pg_attribute a
+                  ON a.attrelid = i.indrelid AND a.attname = 'username'
+                WHERE i.indrelid = 'users'::regclass
+                  AND i.indisunique
+                  AND i.indkey::smallint[] = ARRAY[a.attnum]
+            ) THEN
+                CREATE UNIQUE INDEX idx_users_username ON users (username);
+            END IF;
+        END $$""",
+        """CREATE INDEX IF NOT EXISTS idx_passwords_user_service
+           ON passwords (user_id, service_name)""",
+    )),
+    (3, "vault paging and service search indexes", (
+        # Keyset pagination: WHERE user_id = %s AND password_id > %s ORDER BY password_id
+        """CREATE INDEX IF NOT EXISTS idx_passwords_user_page
+           ON passwords (user_id, password_id)""",
+        # Case-insensitive prefix search: lower(service_name) LIKE 'abc%'
+        """CREATE INDEX IF NOT EXISTS idx_passwords_user_service_prefix
+           ON passwords (user_id, lower(service_name) text_pattern_ops)""",
+    )),
+    (4, "per-user key derivation salt and cost", (
+        # NULL for accounts whose vault still uses the legacy key; filled in
+        # (and the vault re-encrypted) on their next login
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS kdf_salt BYTEA",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS kdf_params VARCHAR(64)",
+    )),
+)
+
+# Arbitrary key so app instances starting together migrate one at a time
+_MIGRATION_LOCK_ID = 7_351_004_211
+
+def initialize_database() -> list:
+    """
+    Create the schema and bring it up to the latest migration.
+    Runs in a single transaction. Returns the versions applied by this call
+    """
+    applied = []
+    with pooled_connection('migrations') as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_ID,))
+        cur.execute(
+            """CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cur.fetchall()}
+        
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    applied = initialize_database()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
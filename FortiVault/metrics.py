@@ -0,0 +1,209 @@
+"""
+Lightweight timing metrics for the auth, crypto and database hot paths.
+
+Disabled unless FORTIVAULT_METRICS=1 (environment or .env). When disabled, @timed returns the
+function unchanged and track() returns a shared no-op context manager, so
+instrumented code pays nothing beyond one attribute lookup.
+
+When enabled, start_metrics_server() serves
+    /metrics       Prometheus text exposition format
+    /metrics.json  the same data as JSON
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+
+# Settings are read at import, which can come before database.py loads .env
+load_dotenv()
+
+ENABLED = os.getenv('FORTIVAULT_METRICS', '0') == '1'
+METRICS_HOST = os.getenv('FORTIVAULT_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('FORTIVAULT_METRICS_PORT', 9108))
+
+# Seconds; covers Fernet (~10us) up to Argon2 under load (seconds)
+BUCKETS = (0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = nullcontext()
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._help: Dict[str, str] = {}
+
+    def observe(self, name: str, value: float, labels: Tuple = ()):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = _Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, labels: Tuple = ()):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def describe(self, name: str, help_text: str):
+        self._help.setdefault(name, help_text)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = {
+                key: (list(h.buckets), h.count, h.sum) for key, h in self._histograms.items()
+            }
+            counters = dict(self._counters)
+        return {'histograms': histograms, 'counters': counters, 'help': dict(self._help)}
+
+REGISTRY = _Registry()
+
+def observe(name: str, seconds: float, **labels):
+    """Record one duration (no-op when disabled)"""
+    if ENABLED:
+        REGISTRY.observe(name, seconds, tuple(sorted(labels.items())))
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment a counter (no-op when disabled)"""
+    if ENABLED:
+        REGISTRY.inc(name, amount, tuple(sorted(labels.items())))
+
+@contextmanager
+def _tracking(name: str, labels: Tuple):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        REGISTRY.inc(name.replace('_seconds', '_errors_total'), 1, labels)
+        raise
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - start, labels)
+
+def track(name: str, **labels):
+    """
+    Time a block:
+        with track('fortivault_db_query_seconds', query='login_lookup'):
+            ...
+    """
+    if not ENABLED:
+        return _NOOP
+    return _tracking(name, tuple(sorted(labels.items())))
+
+def timed(name: str, help_text: str = ''):
+    """Decorator timing every call; returns the function untouched when disabled"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        REGISTRY.describe(name, help_text)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracking(name, ()):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# =============================================
+# Export
+# =============================================
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+def render_prometheus() -> str:
+    snapshot = REGISTRY.snapshot()
+    lines = []
+    seen = set()
+    for (name, labels), (buckets, count, total) in sorted(snapshot['histograms'].items()):
+        if name not in seen:
+            seen.add(name)
+            if name in snapshot['help']:
+                lines.append(f"# HELP {name} {snapshot['help'][name]}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, buckets):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    for (name, labels), value in sorted(snapshot['counters'].items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+def render_json() -> dict:
+    snapshot = REGISTRY.snapshot()
+    histograms = []
+    for (name, labels), (buckets, count, total) in sorted(snapshot['histograms'].items()):
+        histograms.append({
+            'name': name,
+            'labels': dict(labels),
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'buckets': dict(zip((str(b) for b in BUCKETS), buckets)),
+        })
+    counters = [
+        {'name': name, 'labels': dict(labels), 'value': value}
+        for (name, labels), value in sorted(snapshot['counters'].items())
+    ]
+    return {'histograms': histograms, 'counters': counters}
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = render_prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body = json.dumps(render_json()).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Serve /metrics and /metrics.json from a daemon thread (once per process)"""
+    global _server
+    if not ENABLED:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    return _server
@@ -1,8 +1,47 @@
+import hashlib
+import hmac
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from zxcvbn import zxcvbn
+from zxcvbn.frequency_lists import FREQUENCY_LISTS
+from zxcvbn.matching import RANKED_DICTIONARIES
+
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 1024))
+LIVE_FULL_MAX_LENGTH = 20  # longer inputs use the pre-scorer while typing
+ZXCVBN_MAX_LENGTH = 72  # zxcvbn refuses longer input
+ESTIMATE_MAX_SCORE = 2  # a pre-score never claims more until zxcvbn confirms it
+LIVE_CONFIRM_QUEUE = 8  # background zxcvbn runs allowed to wait
+
+# Cache keys are HMACs under a per-process random key, so the cache never
+# holds plaintext and its keys are useless outside this process
+_cache_key_secret = os.urandom(32)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_key(password: str) -> bytes:
+    return hmac.new(_cache_key_secret, password.encode(), hashlib.sha256).digest()
+
+def _cached(key: bytes):
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+def _store(key: bytes, result: dict):
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > ANALYSIS_CACHE_SIZE:
+            _cache.popitem(last=False)
 
 def analyze_password(password: str) -> dict:
     """
-    Analyze password strength using zxcvbn
+    Analyze password strength using zxcvbn (memoised in a bounded LRU)
     Returns:
         dict: {
             'score': 0-4,
@@ -11,10 +50,215 @@ def analyze_password(password: str) -> dict:
             'crack_time': str
         }
     """
-    result = zxcvbn(password)
+    key = _cache_key(password)
+    result = _cached(key)
+    if result is None:
+        full = zxcvbn(password)
+        result = {
+            'score': full['score'],
+            'warning': full['feedback']['warning'],
+            'suggestions': full['feedback']['suggestions'],
+            'crack_time': full['crack_times_display']['offline_slow_hashing_1e4_per_second']
+        }
+        _store(key, result)
+    return dict(result, suggestions=list(result['suggestions']))
+
+# =============================================
+# Pre-scorer
+# =============================================
+class _BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, word: str):
+        digest = hashlib.blake2b(word.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, word: str):
+        for pos in self._positions(word):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, word: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(word))
+
+_common_words = None
+_common_words_lock = threading.Lock()
+
+def _get_common_words() -> _BloomFilter:
+    """Bloom filter of zxcvbn's common-password list, built on first use"""
+    global _common_words
+    if _common_words is None:
+        with _common_words_lock:
+            if _common_words is None:
+                words = FREQUENCY_LISTS['passwords']
+                bloom = _BloomFilter(len(words))
+                for word in words:
+                    bloom.add(word)
+                _common_words = bloom
+    return _common_words
+
+_CLASS_POOLS = (
+    (re.compile(r'[a-z]'), 26),
+    (re.compile(r'[A-Z]'), 26),
+    (re.compile(r'[0-9]'), 10),
+    (re.compile(r'[^a-zA-Z0-9]'), 33),
+)
+_AFFIXES = re.compile(r'^[^a-z]+|[^a-z]+$')
+_LEET = str.maketrans('4@310$5!7', 'aaeiossit')
+_REPEAT = re.compile(r'(.)\1\1')
+_REPEATED_UNIT = re.compile(r'(..+?)\1+')  # 'abcabc'; double letters are left alone
+_SEQUENCES = ('abcdefghijklmnopqrstuvwxyz', '0123456789', 'qwertyuiop', 'asdfghjkl', 'zxcvbnm')
+_MIN_WORD, _MAX_WORD = 3, 16
+_MIN_WORD_GUESSES = 50  # zxcvbn's floor for multi-character matches
+
+_word_ranks = None
+
+def _get_word_ranks() -> dict:
+    """Best rank of every word in zxcvbn's (already loaded) dictionaries"""
+    global _word_ranks
+    if _word_ranks is None:
+        with _common_words_lock:
+            if _word_ranks is None:
+                ranks = {}
+                for dictionary in RANKED_DICTIONARIES.values():
+                    for word, rank in dictionary.items():
+                        if len(word) >= _MIN_WORD and rank < ranks.get(word, rank + 1):
+                            ranks[word] = rank
+                _word_ranks = ranks
+    return _word_ranks
+
+def _guess_bits(text: str, char_bits: float) -> tuple:
+    """
+    Rough guesses (log2) for text: dictionary words, longest first from each
+    position, cost log2(rank) + 1 bits like zxcvbn's dictionary matches
+    (rank floored at _MIN_WORD_GUESSES);
+    other characters cost char_bits. Returns (bits, words found)
+    """
+    ranks = _get_word_ranks()
+    bits, words, i = 0.0, 0, 0
+    while i < len(text):
+        for j in range(min(len(text), i + _MAX_WORD), i + _MIN_WORD - 1, -1):
+            rank = ranks.get(text[i:j])
+            if rank is not None:
+                bits += math.log2(max(rank, _MIN_WORD_GUESSES)) + 1
+                words += 1
+                i = j
+                break
+        else:
+            bits += char_bits
+            i += 1
+    return bits, words
+
+def _has_sequence(lowered: str) -> bool:
+    for i in range(len(lowered) - 2):
+        chunk = lowered[i:i + 3]
+        if any(chunk in seq or chunk in seq[::-1] for seq in _SEQUENCES):
+            return True
+    return False
+
+def estimate_strength(password: str) -> dict:
+    """
+    Cheap pre-score (well under a millisecond): character-class entropy,
+    common-password Bloom filter (also after stripping digit/symbol affixes
+    and undoing l33t substitutions), repeats and keyboard/alphabet runs.
+    Repeated substrings count once ('abcabcabc' scores as 'abc') and
+    dictionary words cost log2(rank) bits instead of their length.
+    Returns:
+        dict: {'score': 0-4, 'entropy_bits': float, 'classes': int,
+               'common': bool, 'patterns': bool, 'repeats': bool, 'words': int}
+    """
+    pool = 0
+    classes = 0
+    for pattern, size in _CLASS_POOLS:
+        if pattern.search(password):
+            pool += size
+            classes += 1
+
+    collapsed = _REPEATED_UNIT.sub(r'\1', _REPEAT.sub(r'\1', password))
+    repeats = collapsed != password
+    lowered = collapsed.lower()
+    entropy, words = _guess_bits(lowered.translate(_LEET), math.log2(pool) if pool else 0.0)
+
+    common_words = _get_common_words()
+    common = any(
+        candidate and candidate in common_words
+        for candidate in (lowered, _AFFIXES.sub('', lowered), lowered.translate(_LEET))
+    )
+    patterns = bool(_REPEAT.search(password)) or _has_sequence(lowered)
+
+    if common:
+        score = 0
+    else:
+        score = sum(entropy >= threshold for threshold in (28, 36, 60, 80))
+        if patterns:
+            score = max(0, score - 1)
     return {
-        'score': result['score'],
-        'warning': result['feedback']['warning'],
-        'suggestions': result['feedback']['suggestions'],
-        'crack_time': result['crack_times_display']['offline_slow_hashing_1e4_per_second']
-    }
\ No newline at end of file
+        'score': score,
+        'entropy_bits': entropy,
+        'classes': classes,
+        'common': common,
+        'patterns': patterns,
+        'repeats': repeats,
+        'words': words,
+    }
+
+def _estimate_result(quick: dict) -> dict:
+    """Pre-score in analyze_password's shape, capped at ESTIMATE_MAX_SCORE"""
+    if quick['common']:
+        warning = "This is a very common password."
+    elif quick['repeats']:
+        warning = 'Repeats like "abcabcabc" are only slightly harder to guess than "abc".'
+    elif quick['patterns']:
+        warning = "Sequences like abc or 6543 are easy to guess."
+    else:
+        warning = ""
+    suggestions = ["Add another word or two. Uncommon words are better."] if quick['score'] < 3 else []
+    return {
+        'score': min(quick['score'], ESTIMATE_MAX_SCORE),
+        'warning': warning,
+        'suggestions': suggestions,
+        'crack_time': None,  # unknown until zxcvbn has run
+        'estimated': True,
+    }
+
+_confirm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='zxcvbn')
+_confirm_slots = threading.BoundedSemaphore(LIVE_CONFIRM_QUEUE)
+
+def _confirm_later(password: str):
+    """Run zxcvbn in the background so the next call finds it cached"""
+    if not _confirm_slots.acquire(blocking=False):
+        return  # busy; a later keystroke asks again
+
+    def job():
+        try:
+            analyze_password(password)
+        finally:
+            _confirm_slots.release()
+    _confirm_executor.submit(job)
+
+def live_strength(password: str) -> dict:
+    """
+    Strength for a meter that updates on every keystroke.
+    Returns the full (cached) zxcvbn analysis when it is cheap or already
+    known. Otherwise returns the pre-score, capped at ESTIMATE_MAX_SCORE,
+    and queues zxcvbn in the background to confirm it. Both have
+    analyze_password's keys plus 'estimated' (crack_time is None while
+    estimated).
+    """
+    cached = _cached(_cache_key(password))
+    if cached is not None:
+        return dict(cached, suggestions=list(cached['suggestions']), estimated=False)
+    quick = estimate_strength(password)
+    if quick['common']:
+        return _estimate_result(quick)
+    if len(password) <= LIVE_FULL_MAX_LENGTH:
+        return dict(analyze_password(password), estimated=False)
+    if len(password) <= ZXCVBN_MAX_LENGTH:
+        _confirm_later(password)
+    return _estimate_result(quick)
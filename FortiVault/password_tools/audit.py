@@ -0,0 +1,107 @@
+import hashlib
+import hmac
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+
+from cryptography.fernet import Fernet
+
+from security import decrypt_many
+from .analyzer import analyze_password
+from .breach_check import check_breach
+
+WEAK_SCORE = 3  # zxcvbn scores below this are flagged as weak
+AUDIT_WORKERS = int(os.getenv('AUDIT_WORKERS', 8))
+
+
+class AuditCache:
+    """
+    Per-session audit results.
+    by_ciphertext lets unchanged entries skip decryption entirely; by_digest
+    shares results between entries that hold the same password. Digests are
+    HMACs under a random per-cache key, so no plaintext or unkeyed hash is kept.
+    """
+
+    def __init__(self):
+        self.key = os.urandom(32)
+        self.by_ciphertext = {}
+        self.by_digest = {}
+
+    def digest(self, password: str) -> bytes:
+        return hmac.new(self.key, password.encode(), hashlib.sha256).digest()
+
+
+def _check_password(password: str) -> dict:
+    analysis = analyze_password(password)
+    return {
+        'score': analysis['score'],
+        'warning': analysis['warning'],
+        'breaches': check_breach(password),
+    }
+
+
+def audit_vault(
+    entries: Iterable[Tuple[int, str, str, str]],
+    cipher: Fernet,
+    cache: AuditCache
+) -> List[dict]:
+    """
+    Audit every entry of a vault
+    Args:
+        entries: (password_id, service_name, username, encrypted_password) rows
+        cipher: the session cipher
+        cache: AuditCache kept across audits in the session
+    Returns:
+        list: one dict per entry with score, warning, breaches (-1 if unknown),
+              reuse_count and weak/reused/breached flags
+    """
+    entries = list(entries)
+
+    # Only entries whose ciphertext changed since the last audit (or whose
+    # last check was incomplete) are decrypted
+    stale = [
+        entry for entry in entries
+        if cache.by_ciphertext.get(entry[3]) not in cache.by_digest
+    ]
+    plaintexts = decrypt_many((entry[3] for entry in stale), cipher)
+
+    unchecked = {}
+    for entry, password in zip(stale, plaintexts):
+        digest = cache.digest(password)
+        cache.by_ciphertext[entry[3]] = digest
+        if digest not in cache.by_digest:
+            unchecked[digest] = password
+    del plaintexts
+
+    # Each distinct password is analysed and breach-checked once
+    if unchecked:
+        with ThreadPoolExecutor(max_workers=AUDIT_WORKERS) as executor:
+            results = executor.map(_check_password, unchecked.values())
+            cache.by_digest.update(zip(unchecked.keys(), results))
+    unchecked.clear()
+
+    digests = [cache.by_ciphertext[entry[3]] for entry in entries]
+    reuse = Counter(digests)
+
+    report = []
+    for (password_id, service, username, _), digest in zip(entries, digests):
+        result = cache.by_digest[digest]
+        report.append({
+            'password_id': password_id,
+            'service': service,
+            'username': username,
+            'score': result['score'],
+            'warning': result['warning'],
+            'breaches': result['breaches'],
+            'reuse_count': reuse[digest],
+            'weak': result['score'] < WEAK_SCORE,
+            'reused': reuse[digest] > 1,
+            'breached': result['breaches'] > 0,
+        })
+
+    # Retry passwords whose breach lookup failed on the next audit
+    for digest in set(digests):
+        if cache.by_digest[digest]['breaches'] < 0:
+            del cache.by_digest[digest]
+    return report
@@ -1,29 +1,63 @@
 import hashlib
 import requests
 import os
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
 
+from .breach_index import BreachIndex
+
 load_dotenv()
 
+# Optional offline index built with `python -m password_tools.breach_index`
+HIBP_INDEX_PATH = os.getenv('HIBP_INDEX_PATH')
+RANGE_CACHE_SIZE = int(os.getenv('HIBP_RANGE_CACHE_SIZE', 4096))
+
+_session = requests.Session()
+_index = None
+_index_lock = threading.Lock()
+
+def _get_index():
+    """Open the offline index once, or None when it is not configured"""
+    global _index
+    if _index is None and HIBP_INDEX_PATH and os.path.exists(HIBP_INDEX_PATH):
+        with _index_lock:
+            if _index is None:
+                _index = BreachIndex(HIBP_INDEX_PATH)
+    return _index
+
+@lru_cache(maxsize=RANGE_CACHE_SIZE)
+def _fetch_range(prefix: str) -> dict:
+    """
+    Fetch one k-anonymity range from the HIBP API as {suffix: count}.
+    Failures raise, so they are not cached.
+    """
+    response = _session.get(
+        f"https://api.pwnedpasswords.com/range/{prefix}",
+        headers={"Add-Padding": "true"},
+        timeout=3
+    )
+    response.raise_for_status()
+    counts = {}
+    for line in response.text.splitlines():
+        suffix, _, count = line.partition(':')
+        counts[suffix] = int(count)
+    return counts
+
 def check_breach(password: str) -> int:
     """
-    Check password against HIBP API
+    Check password against the offline index if configured, otherwise the HIBP API
     Returns:
         int: Number of breaches found (-1 if API error)
     """
+    digest = hashlib.sha1(password.encode()).digest()
+    index = _get_index()
+    if index is not None:
+        return index.count(digest)
+
     try:
-        sha1 = hashlib.sha1(password.encode()).hexdigest().upper()
+        sha1 = digest.hex().upper()
         prefix, suffix = sha1[:5], sha1[5:]
-        
-        response = requests.get(
-            f"https://api.pwnedpasswords.com/range/{prefix}",
-            headers={"Add-Padding": "true"},
-            timeout=3
-        )
-        
-        for line in response.text.splitlines():
-            if line.startswith(suffix):
-                return int(line.split(':')[1])
-        return 0
+        return _fetch_range(prefix).get(suffix, 0)
     except Exception:
-        return -1
\ No newline at end of file
+        return -1
@@ -0,0 +1,147 @@
+"""
+Offline Pwned Passwords index.
+
+Converts a downloaded HIBP corpus into a single sorted binary file that is
+memory-mapped and binary-searched. Two source layouts are accepted, both
+produced by the official PwnedPasswordsDownloader:
+    - a directory with one file per 5-hex-char SHA-1 prefix (00000.txt ...),
+      each line "SUFFIX:COUNT"
+    - a single file of full hashes, each line "SHA1:COUNT", sorted by hash
+
+File layout (little endian):
+    header   8s magic, I version, Q record count
+    fanout   (2**20 + 1) x Q  - first record index for each 20-bit prefix
+    records  N x (18s digest[2:], I count), sorted by digest
+
+Build:  python -m password_tools.breach_index <range_dir|hash_file> <index_file>
+"""
+import mmap
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterator, List, Tuple
+
+MAGIC = b'FVHIBP\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIQ')
+FANOUT_SIZE = 1 << 20  # one bucket per 5-hex-char prefix
+FANOUT = struct.Struct(f'<{FANOUT_SIZE + 1}Q')
+RECORD = struct.Struct('<18sI')
+DATA_OFFSET = HEADER.size + FANOUT.size
+
+
+def _iter_hash_lines(path: str, hex_length: int) -> Iterator[Tuple[str, int]]:
+    with open(path, 'r', encoding='ascii') as f:
+        for line in f:
+            hex_part, _, count = line.strip().partition(':')
+            if len(hex_part) == hex_length and count:
+                yield hex_part.upper(), int(count)
+
+
+def _write_records(out: BinaryIO, records: List[Tuple[bytes, int]]):
+    out.write(b''.join(RECORD.pack(digest[2:], min(count, 0xFFFFFFFF)) for digest, count in records))
+
+
+def _write_from_range_dir(out: BinaryIO, range_dir: str, fanout: List[int]) -> int:
+    total = 0
+    for bucket in range(FANOUT_SIZE):
+        fanout[bucket] = total
+        prefix = f'{bucket:05X}'
+        path = os.path.join(range_dir, prefix + '.txt')
+        if not os.path.exists(path):
+            continue
+        records = sorted(
+            (bytes.fromhex(prefix + suffix), count)
+            for suffix, count in _iter_hash_lines(path, 35)
+        )
+        _write_records(out, records)
+        total += len(records)
+    return total
+
+
+def _write_from_sorted_file(out: BinaryIO, path: str, fanout: List[int]) -> int:
+    total = 0
+    bucket = 0
+    previous = b''
+    batch = []
+    for sha1_hex, count in _iter_hash_lines(path, 40):
+        digest = bytes.fromhex(sha1_hex)
+        if digest <= previous:
+            raise ValueError(f"{path} is not sorted by hash (at {sha1_hex})")
+        previous = digest
+        record_bucket = int(sha1_hex[:5], 16)
+        while bucket <= record_bucket:
+            fanout[bucket] = total
+            bucket += 1
+        batch.append((digest, count))
+        total += 1
+        if len(batch) >= 65536:
+            _write_records(out, batch)
+            batch = []
+    _write_records(out, batch)
+    while bucket < FANOUT_SIZE:
+        fanout[bucket] = total
+        bucket += 1
+    return total
+
+
+def build_index(source: str, index_path: str) -> int:
+    """
+    Build the binary index from a prefix-file directory or a sorted hash file.
+    Missing prefix files are treated as empty. Returns the number of records
+    """
+    fanout = [0] * (FANOUT_SIZE + 1)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.seek(DATA_OFFSET)
+        if os.path.isdir(source):
+            total = _write_from_range_dir(out, source, fanout)
+        else:
+            total = _write_from_sorted_file(out, source, fanout)
+        fanout[FANOUT_SIZE] = total
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, total))
+        out.write(FANOUT.pack(*fanout))
+    os.replace(tmp_path, index_path)
+    return total
+
+
+class BreachIndex:
+    """Read-only, memory-mapped view of an index built by build_index()"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a FortiVault breach index")
+
+    def count(self, sha1_digest: bytes) -> int:
+        """Breach count for a raw 20-byte SHA-1 digest (0 if absent)"""
+        bucket = int.from_bytes(sha1_digest[:3], 'big') >> 4
+        lo, hi = struct.unpack_from('<2Q', self._map, HEADER.size + bucket * 8)
+        key = sha1_digest[2:]
+        data = self._map
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = DATA_OFFSET + mid * RECORD.size
+            probe = data[offset:offset + 18]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return RECORD.unpack_from(data, offset)[1]
+        return 0
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python -m password_tools.breach_index <range_dir|hash_file> <index_file>")
+        sys.exit(1)
+    records = build_index(sys.argv[1], sys.argv[2])
+    print(f"Indexed {records} hashes into {sys.argv[2]}")
@@ -1,6 +1,9 @@
+import re
 import secrets
 import string
-from typing import Optional
+from typing import List, Optional
+
+SYMBOLS = '!@#$%^&*'
 
 def generate_password(
     length: int = 16,
@@ -23,9 +26,67 @@ def generate_password(
     if include_upper: chars += string.ascii_uppercase
     if include_lower: chars += string.ascii_lowercase
     if include_digits: chars += string.digits
-    if include_symbols: chars += '!@#$%^&*'
+    if include_symbols: chars += SYMBOLS
     
     if not chars:
         return None
         
-    return ''.join(secrets.choice(chars) for _ in range(length))
\ No newline at end of file
+    return ''.join(secrets.choice(chars) for _ in range(length))
+
+def _char_classes(include_upper, include_lower, include_digits, include_symbols) -> List[str]:
+    classes = []
+    if include_upper: classes.append(string.ascii_uppercase)
+    if include_lower: classes.append(string.ascii_lowercase)
+    if include_digits: classes.append(string.digits)
+    if include_symbols: classes.append(SYMBOLS)
+    return classes
+
+def generate_passwords(
+    n: int,
+    length: int = 16,
+    include_upper: bool = True,
+    include_lower: bool = True,
+    include_digits: bool = True,
+    include_symbols: bool = True
+) -> Optional[List[str]]:
+    """
+    Generate n cryptographically secure passwords in bulk
+    Entropy is drawn from secrets.token_bytes in large blocks and mapped to
+    characters with bytes.translate. Bytes at or above the largest multiple
+    of the alphabet size are rejected, so there is no modulo bias. Passwords
+    missing an enabled character class are rejected whole, which keeps the
+    result uniform over all passwords that contain every class.
+    Args:
+        n: number of passwords
+        length: 8-64 characters (must fit one of each enabled class)
+    Returns:
+        list: n passwords, or None if invalid config
+    """
+    classes = _char_classes(include_upper, include_lower, include_digits, include_symbols)
+    if n < 0 or not 8 <= length <= 64 or not classes or length < len(classes):
+        return None
+    
+    alphabet = ''.join(classes).encode()
+    size = len(alphabet)
+    limit = 256 - 256 % size  # accept bytes < limit
+    table = bytes(alphabet[b % size] for b in range(256))
+    rejected = bytes(range(limit, 256))
+    class_patterns = [re.compile('[' + re.escape(c) + ']') for c in classes]
+    
+    passwords = []
+    pending = b''
+    while len(passwords) < n:
+        missing = n - len(passwords)
+        # Over-draw to cover rejected bytes and rejected passwords
+        block = secrets.token_bytes(int(missing * length * 1.6 * 256 / limit) + 64)
+        pending += block.translate(table, rejected)
+        usable = len(pending) - len(pending) % length
+        text = pending[:usable].decode('ascii')
+        pending = pending[usable:]
+        for start in range(0, usable, length):
+            candidate = text[start:start + length]
+            if all(p.search(candidate) for p in class_patterns):
+                passwords.append(candidate)
+                if len(passwords) == n:
+                    break
+    return passwords
@@ -2,7 +2,37 @@ from passlib.hash import argon2
 from passlib.exc import MissingBackendError
 import os
 import base64
-from cryptography.fernet import Fernet
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple, Union
+from argon2.low_level import Type, hash_secret_raw
+from cryptography.fernet import Fernet, MultiFernet
+
+import metrics
+from metrics import timed
+
+# =============================================
+# Security Configuration
+# =============================================
+SECURITY_PARAMS = {
+    # Fixed cost used when calibration is off, and by the legacy vault key
+    # that accounts from before per-user KDF settings are migrated from
+    'argon2_rounds': 10,
+    'argon2_memory': 65536,  # 64MB
+    'argon2_parallelism': 4,
+    'salt_size': 16,  # 128-bit
+    # Master-password hashing is calibrated to the host on first use
+    'argon2_calibrate': os.getenv('ARGON2_CALIBRATE', '1') != '0',
+    'argon2_target_ms': int(os.getenv('ARGON2_TARGET_MS', 250)),  # per hash
+    'argon2_max_memory': int(os.getenv('ARGON2_MAX_MEMORY', 65536)),  # KiB per hash
+    'argon2_min_memory': 16384,  # KiB; never calibrate below 16MB
+    'argon2_min_rounds': 2,
+    'argon2_rehash_tolerance': 2,  # rehash when stored rounds are off by this factor
+    # Hashing worker pool: peak Argon2 memory is about hash_workers x memory cost
+    'hash_workers': int(os.getenv('HASH_WORKERS', max(1, min(4, os.cpu_count() or 1)))),
+    'hash_queue_depth': int(os.getenv('HASH_QUEUE_DEPTH', 8)),  # jobs allowed to wait
+}
 
 # =============================================
 # Backend Availability Check
@@ -22,21 +52,187 @@ def _verify_argon2_backend():
 # Perform check when module loads
 _verify_argon2_backend()
 
+# =============================================
+# Argon2 Calibration
+# =============================================
+_calibrated = None
+_calibration_lock = threading.Lock()
+
+def _time_argon2(rounds: int, memory_cost: int, parallelism: int) -> float:
+    """Milliseconds for one hash with the given parameters"""
+    hasher = argon2.using(rounds=rounds, memory_cost=memory_cost, parallelism=parallelism)
+    start = time.perf_counter()
+    hasher.hash("calibration-probe")
+    return (time.perf_counter() - start) * 1000
+
+def calibrate_argon2(target_ms: int = None, max_memory: int = None) -> dict:
+    """
+    Pick Argon2 parameters that take about target_ms per hash on this machine
+    without using more than max_memory KiB.
+    Memory is halved (staying a power-of-two fraction of the budget) until a
+    single round fits the target, then rounds are scaled up to fill it.
+    Returns dict of rounds, memory_cost, parallelism
+    """
+    target_ms = target_ms or SECURITY_PARAMS['argon2_target_ms']
+    memory_cost = max_memory or SECURITY_PARAMS['argon2_max_memory']
+    min_memory = min(SECURITY_PARAMS['argon2_min_memory'], memory_cost)
+    parallelism = max(1, min(SECURITY_PARAMS['argon2_parallelism'], os.cpu_count() or 1))
+    
+    per_round_ms = _time_argon2(1, memory_cost, parallelism)
+    while per_round_ms > target_ms and memory_cost // 2 >= min_memory:
+        memory_cost //= 2
+        per_round_ms = _time_argon2(1, memory_cost, parallelism)
+    
+    rounds = max(SECURITY_PARAMS['argon2_min_rounds'], int(target_ms // max(per_round_ms, 0.001)))
+    return {'rounds': rounds, 'memory_cost': memory_cost, 'parallelism': parallelism}
+
+def get_hashing_params() -> dict:
+    """Parameters for new master-password hashes (calibrated once per process)"""
+    global _calibrated
+    if not SECURITY_PARAMS['argon2_calibrate']:
+        return {
+            'rounds': SECURITY_PARAMS['argon2_rounds'],
+            'memory_cost': SECURITY_PARAMS['argon2_memory'],
+            'parallelism': SECURITY_PARAMS['argon2_parallelism'],
+        }
+    if _calibrated is None:
+        with _calibration_lock:
+            if _calibrated is None:
+                _calibrated = calibrate_argon2()
+    return _calibrated
+
+def _master_hasher():
+    params = get_hashing_params()
+    tolerance = SECURITY_PARAMS['argon2_rehash_tolerance']
+    # Argon2's default type (Argon2id); salt, rounds, m and p are all stored
+    # in the hash string, e.g. $argon2id$v=19$m=65536,t=10,p=4$salt$hash
+    return argon2.using(
+        salt_size=SECURITY_PARAMS['salt_size'],
+        rounds=params['rounds'],
+        memory_cost=params['memory_cost'],
+        parallelism=params['parallelism'],
+        # needs_update() only flags rounds outside this band, so calibration
+        # noise between restarts does not trigger a rehash on every login
+        min_desired_rounds=max(1, params['rounds'] // tolerance),
+        max_desired_rounds=params['rounds'] * tolerance,
+    )
+
+# =============================================
+# Hashing Worker Pool
+# =============================================
+class ServerBusyError(RuntimeError):
+    """Raised when the hashing queue is full; callers should ask the user to retry"""
+
+class HashingPool:
+    """
+    Runs Argon2 jobs on a fixed number of threads (argon2-cffi releases the
+    GIL) so concurrent logins cannot exceed workers x memory_cost of RAM.
+    At most max_pending further jobs may wait; beyond that run() refuses
+    immediately with ServerBusyError instead of stalling the session.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='argon2')
+        self._admission = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._stats = {
+            'completed': 0,
+            'rejected': 0,
+            'in_flight': 0,
+            'queue_wait_ms_total': 0.0,
+            'queue_wait_ms_max': 0.0,
+            'hash_ms_total': 0.0,
+            'hash_ms_max': 0.0,
+        }
+
+    def _record(self, queue_wait_ms: float, hash_ms: float):
+        metrics.observe('fortivault_hash_queue_wait_seconds', queue_wait_ms / 1000)
+        metrics.observe('fortivault_hash_duration_seconds', hash_ms / 1000)
+        with self._lock:
+            stats = self._stats
+            stats['completed'] += 1
+            stats['queue_wait_ms_total'] += queue_wait_ms
+            stats['queue_wait_ms_max'] = max(stats['queue_wait_ms_max'], queue_wait_ms)
+            stats['hash_ms_total'] += hash_ms
+            stats['hash_ms_max'] = max(stats['hash_ms_max'], hash_ms)
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for its result"""
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            metrics.inc('fortivault_hash_rejected_total')
+            raise ServerBusyError("Server busy - too many sign-ins in progress, please retry shortly")
+        
+        enqueued = time.perf_counter()
+        
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record((started - enqueued) * 1000, (time.perf_counter() - started) * 1000)
+        
+        with self._lock:
+            self._stats['in_flight'] += 1
+        try:
+            return self._executor.submit(job).result()
+        finally:
+            with self._lock:
+                self._stats['in_flight'] -= 1
+            self._admission.release()
+
+    def metrics(self) -> dict:
+        """Snapshot of queue-wait and hash-duration counters (milliseconds)"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed'] or 1
+        stats['queue_wait_ms_avg'] = stats['queue_wait_ms_total'] / completed
+        stats['hash_ms_avg'] = stats['hash_ms_total'] / completed
+        return stats
+
+_hashing_pool = None
+_hashing_pool_lock = threading.Lock()
+
+def get_hashing_pool() -> HashingPool:
+    """Process-wide hashing pool, created on first use"""
+    global _hashing_pool
+    if _hashing_pool is None:
+        with _hashing_pool_lock:
+            if _hashing_pool is None:
+                _hashing_pool = HashingPool(
+                    SECURITY_PARAMS['hash_workers'], SECURITY_PARAMS['hash_queue_depth']
+                )
+    return _hashing_pool
+
+def get_hash_metrics() -> dict:
+    return get_hashing_pool().metrics()
+
+def _pooled_hashing_params() -> dict:
+    """
+    get_hashing_params() for callers outside the pool: the first calibration
+    (several hashes at up to argon2_max_memory) runs as a pool job, so it
+    counts against admission control like any other hash
+    Raises ServerBusyError when the hashing queue is full
+    """
+    if _calibrated is None and SECURITY_PARAMS['argon2_calibrate']:
+        return get_hashing_pool().run(get_hashing_params)
+    return get_hashing_params()
+
 # =============================================
 # Password Hashing Functions
 # =============================================
+@timed('fortivault_hash_master_password_seconds', 'Argon2 master-password hashing, including queue wait')
 def hash_master_password(password: str) -> tuple:
     """
     Securely hash a master password with Argon2
     Returns tuple of (hashed_password, salt_hex)
+    Raises ServerBusyError when the hashing queue is full
     """
-    # Using Argon2's default type (which is Argon2id in modern versions)
-    hashed = argon2.using(
-        salt=os.urandom(16),  # 128-bit salt
-        rounds=10,             # Number of iterations
-        memory_cost=65536,     # 64MB memory usage
-        parallelism=4,         # Number of parallel threads
-    ).hash(password)
+    return get_hashing_pool().run(_hash_master_password, password)
+
+def _hash_master_password(password: str) -> tuple:
+    hashed = _master_hasher().hash(password)
     
     # Extract the salt from the hash (it's stored in the hash string)
     # Format: $argon2id$v=19$m=65536,t=10,p=4$salt$hash
@@ -45,8 +241,27 @@ def hash_master_password(password: str) -> tuple:
     
     return hashed, salt_hex
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True when a stored hash was made with stale parameters (different memory
+    cost or parallelism, or rounds outside the tolerance band)
+    Raises ServerBusyError when the hashing queue is full
+    """
+    params = _pooled_hashing_params()
+    hasher = _master_hasher()
+    if hasher.needs_update(hashed_password):
+        return True
+    return argon2.from_string(hashed_password).parallelism != params['parallelism']
+
+@timed('fortivault_verify_master_password_seconds', 'Argon2 verification, including queue wait')
 def verify_master_password(password: str, hashed_password: str) -> bool:
-    """Verify password against stored hash"""
+    """
+    Verify password against stored hash
+    Raises ServerBusyError when the hashing queue is full
+    """
+    return get_hashing_pool().run(_verify_master_password, password, hashed_password)
+
+def _verify_master_password(password: str, hashed_password: str) -> bool:
     try:
         return argon2.verify(password, hashed_password)
     except Exception as e:
@@ -56,42 +271,97 @@ def verify_master_password(password: str, hashed_password: str) -> bool:
 # =============================================
 # Encryption Functions
 # =============================================
-def generate_key_from_password(password: str, salt: bytes) -> bytes:
+@timed('fortivault_key_derivation_seconds', 'Argon2 key derivation, including queue wait')
+def generate_key_from_password(password: str, salt: bytes, params: Optional[dict] = None) -> bytes:
+    """
+    Derive encryption key from password using raw Argon2id output
+    salt and params (see parse_kdf_params) must be the ones stored for the
+    user, or the key will not decrypt their vault; params default to the
+    current calibrated cost
+    Raises ServerBusyError when the hashing queue is full
+    """
+    return get_hashing_pool().run(_generate_key_from_password, password, salt, params)
+
+def _generate_key_from_password(password: str, salt: bytes, params: Optional[dict] = None) -> bytes:
+    params = params or get_hashing_params()
+    key_material = hash_secret_raw(
+        password.encode(), salt,
+        time_cost=params['rounds'],
+        memory_cost=params['memory_cost'],
+        parallelism=params['parallelism'],
+        hash_len=32,
+        type=Type.ID,
+    )
+    return base64.urlsafe_b64encode(key_material)
+
+def new_kdf_settings() -> Tuple[bytes, str]:
+    """
+    Fresh per-user salt and the current (calibrated) cost, formatted for
+    the users.kdf_salt / users.kdf_params columns
+    Raises ServerBusyError when the hashing queue is full
+    """
+    return os.urandom(SECURITY_PARAMS['salt_size']), format_kdf_params(_pooled_hashing_params())
+
+def format_kdf_params(params: dict) -> str:
+    return f"m={params['memory_cost']},t={params['rounds']},p={params['parallelism']}"
+
+def parse_kdf_params(text: str) -> dict:
+    """Inverse of format_kdf_params: 'm=65536,t=3,p=4' -> dict"""
+    values = dict(part.split('=', 1) for part in text.split(','))
+    return {'memory_cost': int(values['m']), 'rounds': int(values['t']), 'parallelism': int(values['p'])}
+
+@timed('fortivault_legacy_key_derivation_seconds', 'One-off legacy key derivation for vault migration')
+def generate_legacy_key(password: str) -> bytes:
     """
-    Derive encryption key from password using Argon2
+    The key vaults were encrypted with before per-user KDF settings. It was
+    the first 32 characters of the encoded Argon2 string, i.e. the
+    '$argon2id$v=19$m=65536,t=10,p=4$' header, so it is the same for every
+    user. Only used to re-encrypt those vaults on their next login
     """
-    # Using the same parameters as password hashing for consistency
+    return get_hashing_pool().run(_generate_legacy_key, password)
+
+def _generate_legacy_key(password: str) -> bytes:
     kdf_hash = argon2.using(
-        salt=salt,
-        rounds=10,
-        memory_cost=65536,
-        parallelism=4,
+        salt=os.urandom(SECURITY_PARAMS['salt_size']),
+        rounds=SECURITY_PARAMS['argon2_rounds'],
+        memory_cost=SECURITY_PARAMS['argon2_memory'],
+        parallelism=SECURITY_PARAMS['argon2_parallelism'],
     ).hash(password)
-    
-    # Use the first 32 bytes of the hash as key material
-    key_material = kdf_hash[:32].encode()
-    return base64.urlsafe_b64encode(key_material)
+    return base64.urlsafe_b64encode(kdf_hash[:32].encode())
 
-def encrypt_data(data: str, key: bytes) -> str:
+def get_cipher(key: bytes) -> Fernet:
+    """
+    Build the session cipher once at login and pass it to the helpers below,
+    instead of handing them the raw key (which rebuilds Fernet on every call)
+    """
+    return Fernet(key)
+
+def rotation_cipher(new_key: bytes, old_key: bytes) -> MultiFernet:
+    """MultiFernet whose rotate() re-encrypts old_key tokens under new_key"""
+    return MultiFernet([Fernet(new_key), Fernet(old_key)])
+
+def _as_cipher(key: Union[bytes, Fernet]) -> Fernet:
+    return key if isinstance(key, Fernet) else Fernet(key)
+
+@timed('fortivault_encrypt_seconds', 'Fernet encryption of one value')
+def encrypt_data(data: str, key: Union[bytes, Fernet]) -> str:
     """
     Encrypt data using Fernet (AES-128)
+    key may be the raw key or the session cipher from get_cipher()
     """
-    fernet = Fernet(key)
-    return fernet.encrypt(data.encode()).decode()
+    return _as_cipher(key).encrypt(data.encode()).decode()
 
-def decrypt_data(encrypted_data: str, key: bytes) -> str:
+@timed('fortivault_decrypt_seconds', 'Fernet decryption of one value')
+def decrypt_data(encrypted_data: str, key: Union[bytes, Fernet]) -> str:
     """
     Decrypt data using Fernet
     """
-    fernet = Fernet(key)
-    return fernet.decrypt(encrypted_data.encode()).decode()
+    return _as_cipher(key).decrypt(encrypted_data.encode()).decode()
 
-# =============================================
-# Security Configuration
-# =============================================
-SECURITY_PARAMS = {
-    'argon2_rounds': 10,
-    'argon2_memory': 65536,  # 64MB
-    'argon2_parallelism': 4,
-    'salt_size': 16  # 128-bit
-}
\ No newline at end of file
+@timed('fortivault_decrypt_many_seconds', 'Fernet decryption of a batch')
+def decrypt_many(tokens: Iterable[str], key: Union[bytes, Fernet]) -> List[str]:
+    """
+    Decrypt a batch of tokens with a single cipher lookup
+    """
+    decrypt = _as_cipher(key).decrypt
+    return [decrypt(token.encode()).decode() for token in tokens]
@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from psycopg2.extras import execute_values
+
+from database import pooled_connection
+
+CHUNK_SIZE = 1000
+EXPORT_FIELDS = ('service_name', 'username', 'encrypted_password', 'url', 'notes')
+
+# Column names used by common password managers (Chrome, Bitwarden,
+# LastPass, 1Password, KeePass CSV exports) mapped to ours
+FIELD_ALIASES = {
+    'service_name': ('service_name', 'service', 'name', 'title', 'website'),
+    'username': ('username', 'login_username', 'user', 'login', 'email'),
+    'password': ('password', 'login_password', 'pass'),
+    'encrypted_password': ('encrypted_password',),
+    'url': ('url', 'login_uri', 'uri', 'website_url'),
+    'notes': ('notes', 'extra', 'note', 'comments'),
+}
+
+class ImportFormatError(ValueError):
+    """Raised for rows that cannot be mapped to a vault entry"""
+
+def _text(value, field: str, line: int):
+    """Field value as a string (numbers and booleans are coerced), or None"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, bool)):
+        return str(value)
+    raise ImportFormatError(f"Row {line}: {field} must be text, not {type(value).__name__}")
+
+def _normalise(row: dict, line: int) -> dict:
+    if not isinstance(row, dict):
+        raise ImportFormatError(f"Row {line}: expected an object with named fields, not {type(row).__name__}")
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    entry = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((lowered[a] for a in aliases if lowered.get(a)), None)
+        entry[field] = _text(value, field, line)
+    if not entry['service_name'] and entry['url']:
+        entry['service_name'] = entry['url']
+    if not entry['service_name'] or not (entry['password'] or entry['encrypted_password']):
+        raise ImportFormatError(f"Row {line}: a service name and a password are required")
+    return entry
+
+def _bitwarden_rows(items: list) -> Iterator[dict]:
+    """
+    Flatten Bitwarden items ({"name", "notes", "login": {"username",
+    "password", "uris": [{"uri"}]}}); secure notes, cards and identities
+    carry no login and are skipped
+    """
+    for item in items:
+        if not isinstance(item, dict):
+            yield item  # rejected by _normalise with its row number
+            continue
+        login = item.get('login')
+        if not isinstance(login, dict):
+            continue
+        row = {k: v for k, v in item.items() if k != 'login'}
+        row['username'] = login.get('username')
+        row['password'] = login.get('password')
+        uris = login.get('uris')
+        if isinstance(uris, list) and uris and isinstance(uris[0], dict):
+            row['url'] = uris[0].get('uri')
+        yield row
+
+def _iter_rows(fileobj: BinaryIO, fmt: str) -> Iterator[dict]:
+    """Yield raw rows one at a time from a CSV, JSON Lines or JSON-array upload"""
+    if fmt == 'csv':
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        yield from csv.DictReader(text)
+    elif fmt == 'jsonl':
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig')
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'json':
+        # A JSON document has to be parsed whole; prefer JSON Lines for large vaults
+        data = json.load(io.TextIOWrapper(fileobj, encoding='utf-8-sig'))
+        if isinstance(data, dict) and isinstance(data.get('items'), list):
+            yield from _bitwarden_rows(data['items'])
+        elif isinstance(data, list):
+            yield from data
+        else:
+            raise ImportFormatError("Expected a JSON array of entries or a Bitwarden export with an 'items' list")
+    else:
+        raise ImportFormatError(f"Unsupported import format: {fmt}")
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def import_entries(fileobj: BinaryIO, fmt: str, user_id: int, cipher: Fernet,
+                   chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Stream entries from an export file into the vault
+    Plaintext passwords are encrypted chunk by chunk; rows that already carry
+    an encrypted_password (a FortiVault export) must decrypt with this cipher.
+    The whole import is one transaction: any bad row rolls everything back.
+    Returns:
+        int: Number of entries imported
+    """
+    rows = (_normalise(row, line) for line, row in enumerate(_iter_rows(fileobj, fmt), start=1))
+    imported = 0
+    with pooled_connection('vault_import') as conn:
+        cur = conn.cursor()
+        for chunk in _chunks(rows, chunk_size):
+            values = []
+            for entry in chunk:
+                if entry['password']:
+                    token = cipher.encrypt(entry['password'].encode()).decode()
+                else:
+                    token = entry['encrypted_password']
+                    try:
+                        cipher.decrypt(token.encode())
+                    except InvalidToken:
+                        raise ImportFormatError(
+                            f"Entry for {entry['service_name']} was encrypted with a different key"
+                        )
+                # VARCHAR(255) columns
+                values.append((user_id, entry['service_name'][:255], (entry['username'] or '')[:255],
+                               token, (entry['url'] or None) and entry['url'][:255], entry['notes']))
+            execute_values(
+                cur,
+                """INSERT INTO passwords
+                (user_id, service_name, username, encrypted_password, url, notes)
+                VALUES %s""",
+                values,
+                page_size=chunk_size
+            )
+            imported += len(values)
+    return imported
+
+def reencrypt_entries(cur, user_id: int, rotation: MultiFernet, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Re-encrypt every entry of a user with rotation.rotate(), in the caller's
+    transaction (so a failure leaves the whole vault on the old key).
+    Walks the vault by password_id in chunks.
+    Returns:
+        int: Number of entries re-encrypted
+    """
+    rotated, after_id = 0, 0
+    while True:
+        cur.execute(
+            """SELECT password_id, encrypted_password FROM passwords
+            WHERE user_id = %s AND password_id > %s ORDER BY password_id LIMIT %s""",
+            (user_id, after_id, chunk_size)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return rotated
+        values = [(password_id, rotation.rotate(token.encode()).decode()) for password_id, token in rows]
+        execute_values(
+            cur,
+            """UPDATE passwords SET encrypted_password = v.token
+            FROM (VALUES %s) AS v (password_id, token)
+            WHERE passwords.password_id = v.password_id""",
+            values,
+            page_size=chunk_size
+        )
+        rotated += len(values)
+        after_id = rows[-1][0]
+
+def export_entries(user_id: int, fmt: str, out: BinaryIO, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Stream the vault to `out` as CSV or JSON Lines. Passwords stay encrypted.
+    Rows come from a server-side cursor, so only chunk_size rows are in memory.
+    Returns:
+        int: Number of entries exported
+    """
+    if fmt not in ('csv', 'jsonl'):
+        raise ImportFormatError(f"Unsupported export format: {fmt}")
+
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+
+    exported = 0
+    with pooled_connection('vault_export') as conn:
+        with conn.cursor(name='vault_export') as cur:
+            cur.itersize = chunk_size
+            cur.execute(
+                """SELECT service_name, username, encrypted_password, url, notes
+                FROM passwords WHERE user_id = %s ORDER BY password_id""",
+                (user_id,)
+            )
+            for row in cur:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    text.write(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n')
+                exported += 1
+    text.flush()
+    text.detach()  # leave `out` open for the caller
+    return exported
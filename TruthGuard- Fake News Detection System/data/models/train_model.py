@@ -1,38 +1,50 @@
+import os
+import sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import PassiveAggressiveClassifier
 from sklearn.metrics import accuracy_score, confusion_matrix
-import pickle
 
-# Load preprocessed data
-df = pd.read_csv("processed_news.csv")
+# Make src/ importable so the pickled pipeline references models.pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src'))
+from models.pipeline import TextPreprocessor, build_pipeline, save_pipeline
+from models.compact import export_compact
 
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(
-    df['processed_text'], 
+# Load preprocessed data (written by src/models/preprocess.py)
+df = pd.read_parquet("processed_news.parquet")
+
+# Split data (raw text for the preprocessor, processed text for the vectorizer)
+X_train, X_test, P_train, P_test, y_train, y_test = train_test_split(
+    df['text'],
+    df['processed_text'],
     df['label'], 
     test_size=0.2, 
     random_state=42
 )
 
-# TF-IDF Vectorizer
+# Lemma table for serving-time preprocessing
+preprocessor = TextPreprocessor().fit(X_train)
+
+# TF-IDF Vectorizer (fitted on the text preprocess.py already cleaned in parallel)
 vectorizer = TfidfVectorizer(stop_words='english', max_df=0.7)
-X_train_tfidf = vectorizer.fit_transform(X_train)
-X_test_tfidf = vectorizer.transform(X_test)
+X_train_tfidf = vectorizer.fit_transform(P_train)
 
 # Initialize and train model
 model = PassiveAggressiveClassifier(max_iter=50)
 model.fit(X_train_tfidf, y_train)
 
-# Predict and evaluate
-y_pred = model.predict(X_test_tfidf)
+# Predict and evaluate on raw text, exactly as the app will
+pipeline = build_pipeline(preprocessor, vectorizer, model)
+y_pred = pipeline.predict(X_test)
 accuracy = accuracy_score(y_test, y_pred)
 print(f"Accuracy: {accuracy*100:.2f}%")
 
-# Save model and vectorizer
-with open('model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-    
-with open('vectorizer.pkl', 'wb') as f:
-    pickle.dump(vectorizer, f)
\ No newline at end of file
+# Serving must see the same features as training
+assert preprocessor.transform(X_test[:100]) == P_test[:100].tolist(), "preprocessing drifted from preprocess.py"
+
+# Save preprocessor + vectorizer + model as one artifact
+save_pipeline(pipeline, 'pipeline.pkl')
+
+# Memory-mapped copy for fast cold starts (see src/models/compact.py)
+export_compact('pipeline_compact', pipeline=pipeline)
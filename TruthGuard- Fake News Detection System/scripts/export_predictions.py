@@ -0,0 +1,22 @@
+# export_predictions.py
+"""
+Export every prediction and its feedback to CSV without going through the
+browser (Streamlit's download button holds the file in memory).
+
+    python scripts/export_predictions.py predictions.csv
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from database.db_utils import DatabaseManager
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else 'fake_news_predictions.csv'
+    db = DatabaseManager()
+    try:
+        with open(output, 'wb') as f:
+            db.export_predictions_csv(f)
+    finally:
+        db.close()
+    print(f"Exported predictions to {output}")
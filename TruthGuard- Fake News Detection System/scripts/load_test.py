@@ -0,0 +1,91 @@
+# load_test.py
+"""
+Load test for the scoring service (src/api/server.py).
+
+    python scripts/load_test.py --url http://127.0.0.1:8000 --concurrency 32 --requests 5000 --texts news.csv
+
+Each client thread keeps one HTTP/1.1 connection open and posts articles
+back to back. Reports p50/p95/p99 latency, requests/sec and errors.
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_TEXT = ("Scientists confirm that drinking coffee every morning reverses ageing, "
+               "according to a study the government does not want you to see.")
+
+
+def load_texts(path, limit=1000):
+    if not path:
+        return [SAMPLE_TEXT]
+    df = pd.read_csv(path, nrows=limit)
+    return (df['title'].fillna('') + ' ' + df['text'].fillna('')).tolist()
+
+
+def run_client(url, texts, count, latencies, errors, lock):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    rng = random.Random()
+    local_latencies = []
+    local_errors = 0
+    for _ in range(count):
+        body = json.dumps({'text': rng.choice(texts)})
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                local_errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        local_latencies.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the TruthGuard scoring service")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=5000, help="total requests")
+    parser.add_argument('--texts', default=None, help="CSV with title/text columns to sample from")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    latencies, errors, lock = [], [0], threading.Lock()
+    per_client = [args.requests // args.concurrency + (i < args.requests % args.concurrency)
+                  for i in range(args.concurrency)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for count in per_client:
+            executor.submit(run_client, args.url, texts, count, latencies, errors, lock)
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"All {args.requests} requests failed")
+        return
+    ms = np.array(latencies) * 1000
+    print(f"Requests:    {len(latencies)} ok, {errors[0]} errors, concurrency {args.concurrency}")
+    print(f"Throughput:  {len(latencies) / elapsed:,.0f} requests/sec")
+    print(f"Latency ms:  p50 {np.percentile(ms, 50):.1f}   p95 {np.percentile(ms, 95):.1f}   "
+          f"p99 {np.percentile(ms, 99):.1f}   max {ms.max():.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+HTTP scoring service with micro-batching.
+
+Usage (from the src/ directory, next to pipeline.pkl or pipeline_compact/):
+    python -m api.server --port 8000
+
+    POST /predict   {"text": "..."}            -> {"label": "FAKE", "confidence": 97.3}
+                    {"texts": ["...", "..."]}  -> {"predictions": [{...}, {...}]}
+                    add "explain": k for the k tokens behind each label:
+                    {"text": "...", "explain": 5} -> {..., "top_tokens": [["hoax", 0.41], ...]}
+    GET  /health    {"status": "ok", "model_version": 3, "queued": 0}
+
+Request threads do not score anything themselves: they enqueue their
+texts and wait. One batching thread takes the first queued text, keeps
+collecting for up to `window_ms` (or until `max_batch` texts), and
+scores the whole batch with one transform and one decision_function
+call via predict_batch (predict_batch_explained when any request in the
+batch asked for explanations). The model comes from ModelStore, so published
+versions are picked up without a restart. When the queue is full the
+service answers 503 instead of building an unbounded backlog.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from models.batch_score import predict_batch, predict_batch_explained
+from models.model_store import ModelStore
+
+BATCH_WINDOW_MS = float(os.getenv('SCORE_BATCH_WINDOW_MS', 5))
+MAX_BATCH = int(os.getenv('SCORE_MAX_BATCH', 64))
+MAX_QUEUE = int(os.getenv('SCORE_MAX_QUEUE', 2048))
+REQUEST_TIMEOUT = float(os.getenv('SCORE_REQUEST_TIMEOUT', 10))
+MAX_BODY_BYTES = 5 * 1024 * 1024
+MAX_EXPLAIN = 50
+
+
+class ServiceBusyError(Exception):
+    """Raised when the scoring queue is full"""
+
+
+class MicroBatcher:
+    """Collects concurrent texts into batches scored by one background thread"""
+
+    def __init__(self, model_store, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, max_queue=MAX_QUEUE):
+        self.model_store = model_store
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.batches = 0
+        self.scored = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts, explain=0):
+        """
+        Queue texts; returns one Future per text resolving to
+        (label, confidence, top_tokens), top_tokens being None unless explain > 0
+        """
+        futures = []
+        for text in texts:
+            future = Future()
+            try:
+                self._queue.put_nowait((text, future, explain))
+            except queue.Full:
+                for queued in futures:
+                    queued.cancel()
+                raise ServiceBusyError("Scoring queue is full")
+            futures.append(future)
+        return futures
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Futures of timed-out or busy-rejected requests are already cancelled
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                model, featurizer = self.model_store.components()
+                texts = [text for text, _, _ in batch]
+                top_k = max(explain for _, _, explain in batch)
+                if top_k:
+                    labels, confidences, explanations = predict_batch_explained(model, featurizer, texts, top_k)
+                else:
+                    labels, confidences = predict_batch(model, featurizer, texts)
+                    explanations = [None] * len(batch)
+                for (_, future, explain), label, confidence, tokens in zip(batch, labels, confidences, explanations):
+                    future.set_result((str(label), round(float(confidence), 2), tokens[:explain] if explain else None))
+                self.batches += 1
+                self.scored += len(batch)
+            except Exception as error:
+                for _, future, _ in batch:
+                    future.set_exception(error)
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive for ingestion clients
+    batcher = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+        self._send_json(200, {
+            'status': 'ok',
+            'model_version': self.batcher.model_store.version,
+            'queued': self.batcher.qsize(),
+            'batches': self.batcher.batches,
+            'scored': self.batcher.scored,
+        })
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body cannot be skipped without a valid length, so drop the connection after replying
+            self.close_connection = True
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': 'request body too large'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            single = 'text' in payload
+            texts = [payload['text']] if single else payload['texts']
+            explain = payload.get('explain', 0)
+            if not isinstance(texts, list) or not all(isinstance(t, str) and t.strip() for t in texts):
+                raise ValueError
+            if isinstance(explain, bool) or not isinstance(explain, int) or not 0 <= explain <= MAX_EXPLAIN:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'error': 'expected {"text": str} or {"texts": [str, ...]} with non-empty text '
+                                           f'and an optional "explain": 0-{MAX_EXPLAIN}'})
+            return
+        if len(texts) > self.batcher.max_queue:
+            # Would never fit in the queue, so retrying cannot help (unlike 503)
+            self._send_json(413, {'error': f'at most {self.batcher.max_queue} texts per request'})
+            return
+
+        try:
+            futures = self.batcher.submit(texts, explain)
+        except ServiceBusyError as error:
+            self._send_json(503, {'error': str(error)})
+            return
+        try:
+            deadline = time.monotonic() + REQUEST_TIMEOUT
+            results = [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            self._send_json(504, {'error': 'scoring timed out'})
+            return
+        except Exception as error:
+            self._send_json(500, {'error': f"scoring failed: {error}"})
+            return
+
+        predictions = []
+        for label, confidence, tokens in results:
+            prediction = {'label': label, 'confidence': confidence}
+            if tokens is not None:
+                prediction['top_tokens'] = tokens
+            predictions.append(prediction)
+        self._send_json(200, predictions[0] if single else {'predictions': predictions})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default of 5 drops connections under bursts
+
+
+def make_server(host='127.0.0.1', port=8000, model_store=None, **batcher_options):
+    handler = type('Handler', (ScoringHandler,), {
+        'batcher': MicroBatcher(model_store or ModelStore(), **batcher_options)
+    })
+    return ScoringServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake news predictions over HTTP")
+    parser.add_argument('--host', default=os.getenv('SCORE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SCORE_PORT', 8000)))
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW_MS,
+                        help="how long to gather requests into one batch")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, window_ms=args.window_ms, max_batch=args.max_batch)
+    print(f"Scoring service on http://{args.host}:{args.port} "
+          f"(window {args.window_ms} ms, batches of up to {args.max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,143 +1,16 @@
-import numpy as np
 import streamlit as st
-import pickle
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-import psycopg2
-from datetime import datetime
 import os
+import sys
+import tempfile
 
-# ==============================================
-# Database Configuration
-# ==============================================
-class DatabaseManager:
-    def __init__(self):
-        self.conn_params = {
-            "dbname": os.getenv("DB_NAME", "fake_news_db"),
-            "user": os.getenv("DB_USER", "news_user"),
-            "password": os.getenv("DB_PASS", "your_secure_password"),
-            "host": os.getenv("DB_HOST", "localhost"),
-            "port": os.getenv("DB_PORT", "5432")
-        }
-    
-    def _get_connection(self):
-        return psycopg2.connect(**self.conn_params)
-    
-    def _convert_for_postgres(self, value):
-        """Convert numpy/pandas types to PostgreSQL-compatible types"""
-        if hasattr(value, 'item'):  # numpy types
-            return value.item()
-        if isinstance(value, (np.integer, np.floating)):
-            return float(value) if isinstance(value, np.floating) else int(value)
-        if isinstance(value, (pd.Timestamp, datetime)):
-            return value.isoformat()
-        return str(value)
-    
-    def save_prediction(self, input_text, prediction_result, confidence):
-        """Save prediction to database"""
-        sql = """
-        INSERT INTO predictions(input_text, prediction_result, confidence)
-        VALUES(%s, %s, %s) RETURNING prediction_id;
-        """
-        
-        conn = None
-        prediction_id = None
-        try:
-            conn = self._get_connection()
-            cur = conn.cursor()
-            
-            # Convert all values
-            input_text = str(input_text)[:5000]  # Truncate long text
-            prediction_result = str(prediction_result)
-            confidence = float(confidence)
-            
-            cur.execute(sql, (input_text, prediction_result, confidence))
-            prediction_id = cur.fetchone()[0]
-            conn.commit()
-            cur.close()
-        except (Exception, psycopg2.DatabaseError) as error:
-            st.error(f"Database error: {error}")
-        finally:
-            if conn is not None:
-                conn.close()
-        
-        return prediction_id
-    
-    def save_feedback(self, prediction_id, is_correct, user_comment=None):
-        """Save user feedback to database"""
-        sql = """
-        INSERT INTO feedback(prediction_id, is_correct, user_comment)
-        VALUES(%s, %s, %s);
-        """
-        
-        conn = None
-        try:
-            conn = self._get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (prediction_id, is_correct, user_comment))
-            conn.commit()
-            cur.close()
-            return True
-        except (Exception, psycopg2.DatabaseError) as error:
-            st.error(f"Database error: {error}")
-            return False
-        finally:
-            if conn is not None:
-                conn.close()
-    
-    def get_prediction_stats(self):
-        """Get statistics about predictions and feedback"""
-        sql = """
-        SELECT 
-            COUNT(*) as total_predictions,
-            AVG(confidence) as avg_confidence,
-            (SELECT COUNT(*) FROM feedback WHERE is_correct = TRUE) as correct_feedback,
-            (SELECT COUNT(*) FROM feedback WHERE is_correct = FALSE) as incorrect_feedback,
-            (SELECT COUNT(*) FROM predictions 
-             WHERE prediction_time >= NOW() - INTERVAL '24 HOURS') as daily_predictions
-        FROM predictions;
-        """
-        
-        conn = None
-        stats = None
-        try:
-            conn = self._get_connection()
-            cur = conn.cursor()
-            cur.execute(sql)
-            stats = cur.fetchone()
-            cur.close()
-        except (Exception, psycopg2.DatabaseError) as error:
-            st.error(f"Database error: {error}")
-        finally:
-            if conn is not None:
-                conn.close()
-        
-        return stats
-    
-    def get_recent_predictions(self, limit=50):
-        """Get recent predictions for admin dashboard"""
-        sql = """
-        SELECT p.prediction_id, p.input_text, p.prediction_result, 
-               p.confidence, p.prediction_time,
-               f.is_correct, f.user_comment
-        FROM predictions p
-        LEFT JOIN feedback f ON p.prediction_id = f.prediction_id
-        ORDER BY p.prediction_time DESC
-        LIMIT %s;
-        """
-        
-        conn = None
-        results = None
-        try:
-            conn = self._get_connection()
-            results = pd.read_sql(sql, conn, params=(limit,))
-        except (Exception, psycopg2.DatabaseError) as error:
-            st.error(f"Database error: {error}")
-        finally:
-            if conn is not None:
-                conn.close()
-        
-        return results
+# Make src/ importable when run with `streamlit run src/app/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_utils import QUERY_MAX_ROWS, QUERY_TIMEOUT_MS, DatabaseManager
+from models.batch_score import predict_batch_explained
+from models.model_store import ModelStore
+from models.prediction_cache import CACHE_PERSIST, PredictionCache
+from models.refresh import REFRESH_INTERVAL, RefreshJob
 
 # ==============================================
 # App Configuration
@@ -182,17 +55,36 @@ st.markdown("""
 @st.cache_resource
 def load_components():
     try:
-        with open('model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        with open('vectorizer.pkl', 'rb') as f:
-            vectorizer = pickle.load(f)
-        return model, vectorizer
+        # Serves the current versioned pipeline (or pipeline.pkl) and picks up
+        # versions published by the refresh job without a restart
+        return ModelStore()
     except Exception as e:
         st.error(f"Error loading model: {e}")
         st.stop()
 
-model, vectorizer = load_components()
-db = DatabaseManager()
+@st.cache_resource
+def get_database():
+    # One pool and write-behind buffer per process, shared by all sessions.
+    # It connects on first use, so predictions still work while PostgreSQL is down
+    return DatabaseManager(on_error=st.error)
+
+@st.cache_resource
+def start_model_refresh():
+    # Opt-in: MODEL_REFRESH_INTERVAL=600 retrains from feedback every 10 minutes,
+    # in a child process so training never slows down request handling
+    if REFRESH_INTERVAL > 0:
+        return RefreshJob(interval=REFRESH_INTERVAL).start()
+    return None
+
+@st.cache_resource
+def get_prediction_cache(_db):
+    # Repeated pastes of the same article skip the model and the INSERT
+    return PredictionCache(db=_db if CACHE_PERSIST else None)
+
+model_store = load_components()
+db = get_database()
+start_model_refresh()
+prediction_cache = get_prediction_cache(db)
 
 # ==============================================
 # Main App Functionality
@@ -213,40 +105,54 @@ def main_app():
     if st.button("Predict", type="primary"):
         if news_input:
             with st.spinner("Analyzing the news article..."):
-                # Vectorize input
-                vec = vectorizer.transform([news_input])
-                
-                # Make prediction
-                pred = model.predict(vec)
-                proba = model._predict_proba_lr(vec)[0]
-                confidence = max(proba) * 100
-                
-                # Save to database
-                prediction_id = db.save_prediction(news_input[:5000], pred[0], confidence)
+                model_version = model_store.version or 0
+                cached = prediction_cache.get(news_input, model_version)
+                if cached is not None:
+                    # Seen before: reuse the stored result and link to its prediction_id
+                    label, confidence, prediction_id, top_tokens = cached
+                    if top_tokens is None:
+                        # Persistent-tier hit: recompute just the explanation
+                        model, vectorizer = model_store.components()
+                        top_tokens = predict_batch_explained(model, vectorizer, [news_input])[2][0]
+                else:
+                    # Preprocess, vectorize and score (same path as bulk scoring)
+                    model, vectorizer = model_store.components()
+                    pred, confidences, explanations = predict_batch_explained(model, vectorizer, [news_input])
+                    label, confidence, top_tokens = pred[0], confidences[0], explanations[0]
+
+                    # Save to database
+                    prediction_id = db.save_prediction(news_input[:5000], label, confidence)
+                    prediction_cache.put(news_input, label, confidence, prediction_id, model_version, top_tokens)
                 
                 # Display result
                 st.markdown("---")
-                if pred[0] == "REAL":
+                if label == "REAL":
                     st.success(f"✅ **Result:** This news is likely REAL (confidence: {confidence:.1f}%)")
                 else:
                     st.error(f"❌ **Result:** This news is likely FAKE (confidence: {confidence:.1f}%)")
+                if top_tokens:
+                    st.markdown(f"**Words that weighed most towards {label}:** " +
+                                ", ".join(f"`{token}` ({weight:+.2f})" for token, weight in top_tokens))
                 
-                # Add feedback section
+                # Add feedback section (only for predictions that were saved)
                 st.markdown("---")
                 st.subheader("Help Improve Our System")
-                st.write("Was this prediction correct?")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("👍 Yes, Correct", key="correct_btn"):
-                        if db.save_feedback(prediction_id, True):
-                            st.success("Thank you for your feedback!")
-                with col2:
-                    if st.button("👎 No, Incorrect", key="incorrect_btn"):
-                        comment = st.text_input("Please provide the correct answer or comments:")
-                        if comment:
-                            if db.save_feedback(prediction_id, False, comment):
-                                st.success("Thank you for helping improve the system!")
+                if prediction_id is None:
+                    st.info("Feedback is unavailable while the database is offline.")
+                else:
+                    st.write("Was this prediction correct?")
+                    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button("👍 Yes, Correct", key="correct_btn"):
+                            if db.save_feedback(prediction_id, True):
+                                st.success("Thank you for your feedback!")
+                    with col2:
+                        if st.button("👎 No, Incorrect", key="incorrect_btn"):
+                            comment = st.text_input("Please provide the correct answer or comments:")
+                            if comment:
+                                if db.save_feedback(prediction_id, False, comment):
+                                    st.success("Thank you for helping improve the system!")
 
                 # Show statistics
                 show_statistics()
@@ -306,14 +212,16 @@ def admin_dashboard():
     # Recent Predictions
     st.subheader("🕒 Recent Predictions")
     limit = st.slider("Number of records to show:", 10, 100, 50)
+    if st.session_state.get('prediction_page_size') != limit:
+        st.session_state.prediction_page_size = limit
+        st.session_state.prediction_cursors = [None]  # keyset each visited page starts before
     
-    predictions = db.get_recent_predictions(limit)
+    predictions, next_cursor = db.get_predictions_page(limit, st.session_state.prediction_cursors[-1])
     if predictions is not None:
-        # Format the dataframe for display
+        # Format the dataframe for display (column-wise)
         predictions['prediction_time'] = pd.to_datetime(predictions['prediction_time']).dt.strftime('%Y-%m-%d %H:%M')
-        predictions['feedback'] = predictions.apply(
-            lambda row: "✅ Correct" if row['is_correct'] == True else ("❌ Incorrect" if row['is_correct'] == False else "No feedback"), 
-            axis=1
+        predictions['feedback'] = (
+            predictions['is_correct'].map({True: "✅ Correct", False: "❌ Incorrect"}).fillna("No feedback")
         )
         
         # Show the dataframe
@@ -332,14 +240,39 @@ def admin_dashboard():
             hide_index=True
         )
         
-        # Download option
-        csv = predictions.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="Download Full Data as CSV",
-            data=csv,
-            file_name='fake_news_predictions.csv',
-            mime='text/csv'
-        )
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("Previous", disabled=len(st.session_state.prediction_cursors) == 1):
+                st.session_state.prediction_cursors.pop()
+                st.rerun()
+        with page_col:
+            st.caption(f"Page {len(st.session_state.prediction_cursors)}")
+        with next_col:
+            if st.button("Next", disabled=next_cursor is None):
+                st.session_state.prediction_cursors.append(next_cursor)
+                st.rerun()
+        
+        # Download option: all rows, streamed by COPY into a temporary file.
+        # download_button only takes regular file objects, so it gets the
+        # file reopened with open(); the copy is removed once it is handed over
+        if st.button("Prepare full CSV export"):
+            export_path = None
+            try:
+                with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as export_file:
+                    export_path = export_file.name
+                    db.export_predictions_csv(export_file)
+                with open(export_path, 'rb') as data:
+                    st.download_button(
+                        label="Download Full Data as CSV",
+                        data=data,
+                        file_name='fake_news_predictions.csv',
+                        mime='text/csv'
+                    )
+            except Exception as e:
+                st.error(f"Export failed: {e}")
+            finally:
+                if export_path is not None:
+                    os.remove(export_path)
     
     st.markdown("---")
     
@@ -348,16 +281,29 @@ def admin_dashboard():
     query = st.text_area("Enter SQL Query (for advanced users only):", 
                         "SELECT * FROM predictions LIMIT 10;")
     
-    if st.button("Execute Query"):
+    st.caption(f"Queries run read-only, time out after {QUERY_TIMEOUT_MS / 1000:g}s "
+               f"and return at most {QUERY_MAX_ROWS} rows.")
+    
+    explain_col, run_col = st.columns(2)
+    with explain_col:
+        explain = st.button("Explain")
+    with run_col:
+        execute = st.button("Execute Query")
+    
+    if explain:
+        try:
+            st.code(db.explain_query(query), language="text")
+        except Exception as e:
+            st.error(f"Query error: {e}")
+    
+    if execute:
         try:
-            conn = db._get_connection()
-            result = pd.read_sql(query, conn)
+            result, truncated = db.run_readonly_query(query)
+            if truncated:
+                st.warning(f"Showing the first {QUERY_MAX_ROWS} rows; add a LIMIT or a WHERE clause to narrow the query.")
             st.dataframe(result, use_container_width=True)
         except Exception as e:
             st.error(f"Query error: {e}")
-        finally:
-            if 'conn' in locals() and conn is not None:
-                conn.close()
 
 # ==============================================
 # App Navigation
@@ -8,6 +8,126 @@ DB_PASS = "your_secure_password"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
+# Running totals kept up to date by statement-level triggers, so the stats
+# panel reads one row plus at most 25 hourly buckets instead of scanning
+# predictions and feedback. Transition tables let a multi-row INSERT
+# update the rollups once per statement (PostgreSQL 11+).
+ROLLUP_COMMANDS = (
+    """
+    CREATE TABLE IF NOT EXISTS prediction_stats (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        total_predictions BIGINT NOT NULL DEFAULT 0,
+        confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        correct_feedback BIGINT NOT NULL DEFAULT 0,
+        incorrect_feedback BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS prediction_stats_hourly (
+        bucket TIMESTAMP PRIMARY KEY,
+        predictions BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    # Block writers while the rollups are seeded, so no row is missed or counted twice
+    "LOCK TABLE predictions, feedback IN SHARE ROW EXCLUSIVE MODE",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM prediction_stats) THEN
+            INSERT INTO prediction_stats
+                (id, total_predictions, confidence_sum, correct_feedback, incorrect_feedback)
+            SELECT TRUE, COUNT(*), COALESCE(SUM(confidence), 0),
+                   (SELECT COUNT(*) FROM feedback WHERE is_correct = TRUE),
+                   (SELECT COUNT(*) FROM feedback WHERE is_correct = FALSE)
+            FROM predictions;
+
+            INSERT INTO prediction_stats_hourly (bucket, predictions)
+            SELECT date_trunc('hour', prediction_time), COUNT(*)
+            FROM predictions GROUP BY 1
+            ON CONFLICT (bucket) DO NOTHING;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rollup_predictions_insert() RETURNS trigger AS $$
+    BEGIN
+        UPDATE prediction_stats SET
+            total_predictions = total_predictions + d.n,
+            confidence_sum = confidence_sum + d.s
+        FROM (SELECT COUNT(*) AS n, COALESCE(SUM(confidence), 0) AS s FROM new_rows) d;
+
+        INSERT INTO prediction_stats_hourly (bucket, predictions)
+        SELECT date_trunc('hour', prediction_time), COUNT(*) FROM new_rows GROUP BY 1
+        ON CONFLICT (bucket) DO UPDATE
+            SET predictions = prediction_stats_hourly.predictions + EXCLUDED.predictions;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rollup_predictions_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE prediction_stats SET
+            total_predictions = total_predictions - d.n,
+            confidence_sum = confidence_sum - d.s
+        FROM (SELECT COUNT(*) AS n, COALESCE(SUM(confidence), 0) AS s FROM old_rows) d;
+
+        UPDATE prediction_stats_hourly h SET predictions = h.predictions - d.n
+        FROM (SELECT date_trunc('hour', prediction_time) AS bucket, COUNT(*) AS n
+              FROM old_rows GROUP BY 1) d
+        WHERE h.bucket = d.bucket;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rollup_feedback_insert() RETURNS trigger AS $$
+    BEGIN
+        UPDATE prediction_stats SET
+            correct_feedback = correct_feedback + d.correct,
+            incorrect_feedback = incorrect_feedback + d.incorrect
+        FROM (SELECT COUNT(*) FILTER (WHERE is_correct) AS correct,
+                     COUNT(*) FILTER (WHERE NOT is_correct) AS incorrect
+              FROM new_rows) d;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION rollup_feedback_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE prediction_stats SET
+            correct_feedback = correct_feedback - d.correct,
+            incorrect_feedback = incorrect_feedback - d.incorrect
+        FROM (SELECT COUNT(*) FILTER (WHERE is_correct) AS correct,
+                     COUNT(*) FILTER (WHERE NOT is_correct) AS incorrect
+              FROM old_rows) d;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS predictions_rollup_insert ON predictions",
+    """
+    CREATE TRIGGER predictions_rollup_insert AFTER INSERT ON predictions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_predictions_insert()
+    """,
+    "DROP TRIGGER IF EXISTS predictions_rollup_delete ON predictions",
+    """
+    CREATE TRIGGER predictions_rollup_delete AFTER DELETE ON predictions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_predictions_delete()
+    """,
+    "DROP TRIGGER IF EXISTS feedback_rollup_insert ON feedback",
+    """
+    CREATE TRIGGER feedback_rollup_insert AFTER INSERT ON feedback
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_feedback_insert()
+    """,
+    "DROP TRIGGER IF EXISTS feedback_rollup_delete ON feedback",
+    """
+    CREATE TRIGGER feedback_rollup_delete AFTER DELETE ON feedback
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_feedback_delete()
+    """,
+)
+
 def create_tables():
     """Create the necessary tables in PostgreSQL"""
     commands = (
@@ -28,8 +148,25 @@ def create_tables():
             user_comment TEXT,
             feedback_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
         )
-        """         
-    )
+        """,
+        # Keyset pagination on the admin dashboard walks this index backwards
+        "CREATE INDEX IF NOT EXISTS idx_predictions_time_id ON predictions (prediction_time, prediction_id)",
+        "DROP INDEX IF EXISTS idx_predictions_time",
+        # Covers the join and "latest feedback per prediction"
+        "CREATE INDEX IF NOT EXISTS idx_feedback_prediction_id ON feedback (prediction_id, feedback_id)",
+        "DROP INDEX IF EXISTS idx_feedback_prediction",
+        """
+        CREATE TABLE IF NOT EXISTS prediction_fingerprints (
+            fingerprint CHAR(32) NOT NULL,
+            model_version INTEGER NOT NULL DEFAULT 0,
+            prediction_id INTEGER NOT NULL REFERENCES predictions(prediction_id) ON DELETE CASCADE,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (fingerprint, model_version)
+        )
+        """,
+        # Expired cache entries are deleted by age (DatabaseManager._maybe_prune)
+        "CREATE INDEX IF NOT EXISTS idx_prediction_fingerprints_created ON prediction_fingerprints (created_at)",
+    ) + ROLLUP_COMMANDS
     
     conn = None
     try:
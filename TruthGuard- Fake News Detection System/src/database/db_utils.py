@@ -1,86 +1,540 @@
-import psycopg2
+import atexit
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import execute_values
+
+
+QUERY_TIMEOUT_MS = int(os.getenv("ADMIN_QUERY_TIMEOUT_MS", 5000))
+QUERY_MAX_ROWS = int(os.getenv("ADMIN_QUERY_MAX_ROWS", 1000))
+# Literals, quoted identifiers and comments, which may contain ';' or keywords
+_SQL_QUOTED = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|(?<![\w$])(\$\w*\$).*?\1",
+    re.DOTALL
+)
+# EXPLAIN ANALYZE (or ANALYSE, or inside an option list) executes the statement
+_EXPLAIN_EXECUTES = re.compile(r"^\s*(?:ANALY[SZ]E\b|\([^)]*\bANALY[SZ]E\b)", re.IGNORECASE)
+FINGERPRINT_PRUNE_INTERVAL = float(os.getenv("PREDICTION_CACHE_PRUNE_INTERVAL", 3600))  # seconds
+
+# Row tuples for each write-behind buffer, flushed in this (foreign key) order
+_INSERTS = (
+    ("predictions", """INSERT INTO predictions(prediction_id, input_text, prediction_result, confidence)
+        VALUES %s"""),
+    ("feedback", "INSERT INTO feedback(prediction_id, is_correct, user_comment) VALUES %s"),
+    # A repeat after the entry expired re-points it at the new prediction and restarts its TTL
+    ("prediction_fingerprints", """INSERT INTO prediction_fingerprints(fingerprint, model_version, prediction_id)
+        VALUES %s ON CONFLICT (fingerprint, model_version)
+        DO UPDATE SET prediction_id = EXCLUDED.prediction_id, created_at = EXCLUDED.created_at"""),
+)
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no pooled connection frees up within the checkout timeout"""
+
+
+# Errors after which the same rows may well succeed later: keep them buffered
+_TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, pg_pool.PoolError, PoolExhaustedError)
+
+
 class DatabaseManager:
-    def __init__(self):
+    """
+    Shared access to the predictions database.
+
+    Connections come from a ThreadedConnectionPool, so requests never pay
+    for a connection handshake. Predictions and feedback are buffered and
+    written by a background thread with multi-row INSERTs, every
+    `flush_rows` rows or `flush_interval_ms`, whichever comes first.
+    Prediction ids are reserved from the sequence in blocks so
+    save_prediction() can return an id without a round-trip. Pending rows
+    are flushed by close(), which also runs at interpreter exit.
+
+    The pool is created on first use, so the app starts (and keeps
+    predicting) while PostgreSQL is down. A batch that fails on a
+    connection error is kept for the next flush; one that fails on its
+    data is retried row by row, and rows that still fail go to
+    `dead_letters` instead of blocking the buffer. `on_error` reports
+    errors to the caller, `log` those of the background writer.
+
+    Once fingerprints are saved with a max age, the writer also deletes
+    expired prediction cache entries every FINGERPRINT_PRUNE_INTERVAL.
+    """
+
+    def __init__(self, min_connections=1, max_connections=10, flush_rows=100,
+                 flush_interval_ms=200, id_block_size=100, max_pending=10000,
+                 checkout_timeout=10, reconnect_interval=5, on_error=print, log=print):
         self.conn_params = {
-            "dbname": "fake_news_db",
-            "user": "news_user",
-            "password": "your_secure_password",
-            "host": "localhost",
-            "port": "5432"
+            "dbname": os.getenv("DB_NAME", "fake_news_db"),
+            "user": os.getenv("DB_USER", "news_user"),
+            "password": os.getenv("DB_PASS", "your_secure_password"),
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": os.getenv("DB_PORT", "5432"),
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5))
         }
-    
-    def _get_connection(self):
-        return psycopg2.connect(**self.conn_params)
-    
-    def save_prediction(self, input_text, prediction_result, confidence):
-        """Save prediction to database"""
-        sql = """
-        INSERT INTO predictions(input_text, prediction_result, confidence)
-        VALUES(%s, %s, %s) RETURNING prediction_id;
-        """
-        
+        self.on_error = on_error
+        self.log = log
+        self._min_connections = min_connections
+        self._max_connections = max_connections
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._next_connect = 0.0
+        self._reconnect_interval = reconnect_interval
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._checkout_timeout = checkout_timeout
+        self.dead_letters = deque(maxlen=1000)  # (table, row, error) that could not be written
+
+        self._flush_rows = flush_rows
+        self._flush_interval = flush_interval_ms / 1000
+        self._id_block_size = id_block_size
+        self._max_pending = max_pending
+        self._reserved_ids = deque()
+        self._id_lock = threading.Lock()
+        self._pending_predictions = []
+        self._pending_feedback = []
+        self._pending_fingerprints = []
+        self._fingerprint_max_age = None
+        self._next_prune = 0.0
+        self._oldest_pending = None
+        self._buffer = threading.Condition()
+        self._closed = False
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="db-write-behind", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ==============================================
+    # Connections
+    # ==============================================
+    def _get_pool(self):
+        """The connection pool, created on first use; retried at most every reconnect_interval"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if time.monotonic() < self._next_connect:
+                        raise psycopg2.OperationalError("Database unavailable, retrying shortly")
+                    try:
+                        self._pool = pg_pool.ThreadedConnectionPool(
+                            self._min_connections, self._max_connections, **self.conn_params
+                        )
+                    except psycopg2.Error:
+                        self._next_connect = time.monotonic() + self._reconnect_interval
+                        raise
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commit on success, roll back on error"""
+        pool = self._get_pool()
+        if not self._slots.acquire(timeout=self._checkout_timeout):
+            raise PoolExhaustedError("Timed out waiting for a database connection")
         conn = None
-        prediction_id = None
         try:
-            conn = self._get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (input_text, prediction_result, confidence))
-            prediction_id = cur.fetchone()[0]
+            conn = pool.getconn()
+            if conn.closed:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            yield conn
             conn.commit()
-            cur.close()
-        except (Exception, psycopg2.DatabaseError) as error:
-            print(error)
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
         finally:
             if conn is not None:
-                conn.close()
-        
-        return prediction_id
-    
+                pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def _convert_for_postgres(self, value):
+        """Convert numpy/pandas types to PostgreSQL-compatible types"""
+        if hasattr(value, 'item'):  # numpy types
+            return value.item()
+        if isinstance(value, (np.integer, np.floating)):
+            return float(value) if isinstance(value, np.floating) else int(value)
+        if isinstance(value, (pd.Timestamp, datetime)):
+            return value.isoformat()
+        return str(value)
+
+    # ==============================================
+    # Write-behind buffer
+    # ==============================================
+    def _next_prediction_id(self):
+        with self._id_lock:
+            if not self._reserved_ids:
+                with self.connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute(
+                        """SELECT nextval(pg_get_serial_sequence('predictions', 'prediction_id'))
+                        FROM generate_series(1, %s)""",
+                        (self._id_block_size,)
+                    )
+                    self._reserved_ids.extend(row[0] for row in cur.fetchall())
+            return self._reserved_ids.popleft()
+
+    def _pending_count(self):
+        # Callers hold self._buffer
+        return len(self._pending_predictions) + len(self._pending_feedback) + len(self._pending_fingerprints)
+
+    def _enqueue(self, rows, row):
+        with self._buffer:
+            if self._closed:
+                raise RuntimeError("DatabaseManager is closed")
+            rows.append(row)
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+                # Wake the idle writer so it starts the flush_interval countdown
+                self._buffer.notify()
+            elif self._pending_count() >= self._flush_rows:
+                self._buffer.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self._buffer:
+                while not self._closed:
+                    pending = self._pending_count()
+                    if pending >= self._flush_rows:
+                        break
+                    if not pending:
+                        self._buffer.wait()
+                        continue
+                    remaining = self._flush_interval - (time.monotonic() - self._oldest_pending)
+                    if remaining <= 0:
+                        break
+                    self._buffer.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+            self._maybe_prune()
+
+    def _maybe_prune(self):
+        if self._fingerprint_max_age is None or time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + FINGERPRINT_PRUNE_INTERVAL
+        try:
+            with self.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """DELETE FROM prediction_fingerprints
+                    WHERE created_at < LOCALTIMESTAMP - make_interval(secs => %s)""",
+                    (self._fingerprint_max_age,)
+                )
+                cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.log(f"Could not prune expired prediction fingerprints: {error}")
+
+    def _write(self, batches, row_by_row=False):
+        """
+        Insert the buffered rows in one transaction. row_by_row wraps each
+        row in a savepoint and dead-letters the ones that fail
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+            for (table, sql), rows in zip(_INSERTS, batches):
+                if not rows:
+                    continue
+                if table == "prediction_fingerprints":
+                    # DO UPDATE may not touch one row twice in a statement: keep the latest per key
+                    rows = list({row[:2]: row for row in rows}.values())
+                if not row_by_row:
+                    execute_values(cur, sql, rows)
+                    continue
+                for row in rows:
+                    cur.execute("SAVEPOINT write_row")
+                    try:
+                        execute_values(cur, sql, [row])
+                    except _TRANSIENT_ERRORS:
+                        raise
+                    except (Exception, psycopg2.DatabaseError) as error:
+                        cur.execute("ROLLBACK TO SAVEPOINT write_row")
+                        self.dead_letters.append((table, row, str(error)))
+                        self.log(f"Dropped a {table} row the database rejected: {error} {str(row)[:200]}")
+                    else:
+                        cur.execute("RELEASE SAVEPOINT write_row")
+
+    def _requeue(self, batches, error):
+        self.log(f"Database unavailable, keeping {sum(map(len, batches))} rows for retry: {error}")
+        with self._buffer:
+            # Keep the rows for the next attempt unless the buffer is already full
+            if len(self._pending_predictions) + len(batches[0]) > self._max_pending:
+                self.log(f"Write-behind buffer full: dropped {sum(map(len, batches))} rows")
+                return
+            for pending, rows in zip(
+                (self._pending_predictions, self._pending_feedback, self._pending_fingerprints), batches
+            ):
+                pending[:0] = rows
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+                self._buffer.notify()
+
+    def flush(self):
+        """Write all buffered predictions and feedback in one transaction"""
+        with self._buffer:
+            batches = (self._pending_predictions, self._pending_feedback, self._pending_fingerprints)
+            self._pending_predictions, self._pending_feedback, self._pending_fingerprints = [], [], []
+            self._oldest_pending = None
+        if not any(batches):
+            return True
+
+        try:
+            self._write(batches)
+            return True
+        except _TRANSIENT_ERRORS as error:
+            self._requeue(batches, error)
+            return False
+        except (Exception, psycopg2.DatabaseError) as error:
+            # One bad row (NUL byte, foreign key violation, ...) fails the whole batch
+            self.log(f"Batch write failed, retrying row by row: {error}")
+
+        try:
+            self._write(batches, row_by_row=True)
+            return True
+        except _TRANSIENT_ERRORS as error:
+            self._requeue(batches, error)
+            return False
+        except (Exception, psycopg2.DatabaseError) as error:
+            for (table, _), rows in zip(_INSERTS, batches):
+                self.dead_letters.extend((table, row, str(error)) for row in rows)
+            self.log(f"Dropped {sum(map(len, batches))} rows after the row-by-row retry failed: {error}")
+            return False
+
+    def close(self):
+        """Stop the background writer, flush pending rows and close the pool"""
+        with self._buffer:
+            if self._closed:
+                return
+            self._closed = True
+            self._buffer.notify()
+        self._flusher.join()
+        self.flush()
+        if self._pool is not None:
+            self._pool.closeall()
+
+    # ==============================================
+    # Public API
+    # ==============================================
+    def save_prediction(self, input_text, prediction_result, confidence):
+        """Queue a prediction for writing and return its prediction_id"""
+        try:
+            prediction_id = self._next_prediction_id()
+            self._enqueue(self._pending_predictions, (
+                prediction_id,
+                # PostgreSQL text cannot hold NUL; truncate long text
+                str(input_text).replace("\x00", "")[:5000],
+                str(prediction_result),
+                float(confidence)
+            ))
+            return prediction_id
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.on_error(f"Database error: {error}")
+            return None
+
     def save_feedback(self, prediction_id, is_correct, user_comment=None):
-        """Save user feedback to database"""
+        """Queue user feedback for writing"""
+        try:
+            if user_comment is not None:
+                user_comment = str(user_comment).replace("\x00", "")
+            self._enqueue(self._pending_feedback, (prediction_id, is_correct, user_comment))
+            return True
+        except Exception as error:
+            self.on_error(f"Database error: {error}")
+            return False
+
+    def save_fingerprint(self, fingerprint, prediction_id, model_version=0, max_age_seconds=None):
+        """
+        Queue a prediction cache entry; written after its prediction row.
+        Entries older than max_age_seconds are pruned by the writer
+        """
+        try:
+            if max_age_seconds is not None:
+                self._fingerprint_max_age = max_age_seconds
+            self._enqueue(self._pending_fingerprints, (fingerprint, model_version, prediction_id))
+            return True
+        except Exception as error:
+            self.on_error(f"Database error: {error}")
+            return False
+
+    def find_cached_prediction(self, fingerprint, model_version=0, max_age_seconds=86400):
+        """(label, confidence, prediction_id) of a recent prediction with this fingerprint, or None"""
         sql = """
-        INSERT INTO feedback(prediction_id, is_correct, user_comment)
-        VALUES(%s, %s, %s);
+        SELECT p.prediction_result, p.confidence, p.prediction_id
+        FROM prediction_fingerprints f
+        JOIN predictions p ON p.prediction_id = f.prediction_id
+        WHERE f.fingerprint = %s AND f.model_version = %s
+          AND f.created_at >= LOCALTIMESTAMP - make_interval(secs => %s);
         """
-        
-        conn = None
+
+        row = None
         try:
-            conn = self._get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (prediction_id, is_correct, user_comment))
-            conn.commit()
-            cur.close()
+            with self.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (fingerprint, model_version, max_age_seconds))
+                row = cur.fetchone()
+                cur.close()
         except (Exception, psycopg2.DatabaseError) as error:
-            print(error)
-        finally:
-            if conn is not None:
-                conn.close()
-    
+            self.on_error(f"Database error: {error}")
+
+        return row
+
     def get_prediction_stats(self):
         """Get statistics about predictions and feedback"""
+        # Reads the trigger-maintained rollups (see database_setup.py); the
+        # daily count is summed over hourly buckets, so it covers the last
+        # 24 hours plus the current partial hour
         sql = """
-        SELECT 
-            COUNT(*) as total_predictions,
-            AVG(confidence) as avg_confidence,
-            (SELECT COUNT(*) FROM feedback WHERE is_correct = TRUE) as correct_feedback,
-            (SELECT COUNT(*) FROM feedback WHERE is_correct = FALSE) as incorrect_feedback
-        FROM predictions;
+        SELECT
+            s.total_predictions,
+            COALESCE(s.confidence_sum / NULLIF(s.total_predictions, 0), 0) as avg_confidence,
+            s.correct_feedback,
+            s.incorrect_feedback,
+            (SELECT COALESCE(SUM(h.predictions), 0) FROM prediction_stats_hourly h
+             WHERE h.bucket >= date_trunc('hour', LOCALTIMESTAMP - INTERVAL '24 HOURS')) as daily_predictions
+        FROM prediction_stats s;
         """
-        
-        conn = None
+
         stats = None
         try:
-            conn = self._get_connection()
+            with self.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql)
+                stats = cur.fetchone()
+                cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.on_error(f"Database error: {error}")
+
+        return stats
+
+    def get_predictions_page(self, page_size=50, before=None):
+        """
+        One page of predictions, newest first, with their latest feedback.
+        `before` is the (prediction_time, prediction_id) of the last row of
+        the previous page; the keyset condition walks the
+        (prediction_time, prediction_id) index instead of sorting the table.
+        Returns (DataFrame, cursor for the next page or None)
+        """
+        sql = """
+        SELECT p.prediction_id, p.input_text, p.prediction_result,
+               p.confidence, p.prediction_time,
+               f.is_correct, f.user_comment
+        FROM predictions p
+        LEFT JOIN LATERAL (
+            SELECT is_correct, user_comment FROM feedback
+            WHERE feedback.prediction_id = p.prediction_id
+            ORDER BY feedback_id DESC LIMIT 1
+        ) f ON TRUE
+        {where}
+        ORDER BY p.prediction_time DESC, p.prediction_id DESC
+        LIMIT %s;
+        """
+        if before is None:
+            sql, params = sql.format(where=""), (page_size + 1,)
+        else:
+            sql = sql.format(where="WHERE (p.prediction_time, p.prediction_id) < (%s, %s)")
+            params = (before[0], before[1], page_size + 1)
+
+        results, next_cursor = None, None
+        try:
+            with self.connection() as conn:
+                results = pd.read_sql(sql, conn, params=params)
+            # One extra row tells whether a next page exists
+            if len(results) > page_size:
+                results = results.iloc[:page_size]
+                last = results.iloc[-1]
+                next_cursor = (last['prediction_time'].to_pydatetime(), int(last['prediction_id']))
+        except (Exception, psycopg2.DatabaseError) as error:
+            self.on_error(f"Database error: {error}")
+
+        return results, next_cursor
+
+    def get_recent_predictions(self, limit=50):
+        """Get recent predictions for admin dashboard"""
+        results, _ = self.get_predictions_page(limit)
+        return results
+
+    # ==============================================
+    # Admin query console
+    # ==============================================
+    @staticmethod
+    def _single_statement(query):
+        query = query.strip()
+        if query.endswith(';'):
+            query = query[:-1].rstrip()
+        code = _SQL_QUOTED.sub(' ', query)
+        if not code.strip():
+            raise ValueError("Empty query")
+        # psycopg2 runs every statement in the string, so ';' outside quotes is refused here
+        if ';' in code:
+            raise ValueError("Only a single statement can be run")
+        return query
+
+    @contextmanager
+    def _readonly_transaction(self, timeout_ms):
+        """Pooled connection in a READ ONLY transaction with local time limits"""
+        with self.connection() as conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("SET TRANSACTION READ ONLY")
+                # SET LOCAL ends with the transaction, so pooled connections are unaffected
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+                cur.execute("SET LOCAL lock_timeout = %s", (min(int(timeout_ms), 1000),))
+                cur.execute("SET LOCAL idle_in_transaction_session_timeout = %s", (int(timeout_ms) * 2,))
+                cur.close()
+                yield conn
+            finally:
+                conn.rollback()
+
+    def explain_query(self, query, timeout_ms=QUERY_TIMEOUT_MS):
+        """Planner output for an ad-hoc query, without running it"""
+        query = self._single_statement(query)
+        if _EXPLAIN_EXECUTES.match(_SQL_QUOTED.sub(' ', query)):
+            raise ValueError("EXPLAIN ANALYZE runs the query; enter the query alone")
+        with self._readonly_transaction(timeout_ms) as conn:
             cur = conn.cursor()
-            cur.execute(sql)
-            stats = cur.fetchone()
+            cur.execute("EXPLAIN " + query)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+            cur.close()
+        return plan
+
+    def run_readonly_query(self, query, max_rows=QUERY_MAX_ROWS, timeout_ms=QUERY_TIMEOUT_MS):
+        """
+        Run an ad-hoc SELECT for the admin console. The query runs in a
+        read-only transaction with statement and lock timeouts, through a
+        named server-side cursor, and at most max_rows rows are fetched.
+        Returns (DataFrame, truncated)
+        """
+        query = self._single_statement(query)
+        with self._readonly_transaction(timeout_ms) as conn:
+            # DECLARE only accepts row-returning statements
+            with conn.cursor(name="admin_console") as cur:
+                cur.execute(query)
+                rows = cur.fetchmany(max_rows + 1)
+                columns = [col.name for col in cur.description]
+        truncated = len(rows) > max_rows
+        return pd.DataFrame.from_records(rows[:max_rows], columns=columns), truncated
+
+    def export_predictions_csv(self, out):
+        """
+        Stream every prediction and its feedback to the binary file `out`
+        as CSV. COPY runs on the server and psycopg2 writes its output
+        straight to `out`, so no rows are held in Python.
+        """
+        sql = """
+        COPY (
+            SELECT p.prediction_id, p.input_text, p.prediction_result,
+                   p.confidence, p.prediction_time,
+                   f.is_correct, f.user_comment, f.feedback_time
+            FROM predictions p
+            LEFT JOIN feedback f ON p.prediction_id = f.prediction_id
+            ORDER BY p.prediction_id, f.feedback_id
+        ) TO STDOUT WITH (FORMAT csv, HEADER)
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+            cur.copy_expert(sql, out)
             cur.close()
-        except (Exception, psycopg2.DatabaseError) as error:
-            print(error)
-        finally:
-            if conn is not None:
-                conn.close()
-        
-        return stats
\ No newline at end of file
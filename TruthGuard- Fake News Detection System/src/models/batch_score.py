@@ -0,0 +1,177 @@
+"""
+Bulk scoring of news articles with the trained model and vectorizer.
+
+Usage (from the src/ directory):
+    python -m models.batch_score articles.csv scored.csv
+    python -m models.batch_score feed.jsonl scored.jsonl --workers 8 --chunk-size 5000
+    python -m models.batch_score articles.csv scored.csv --explain 5
+
+Input is CSV or JSON Lines; the text columns (default: title and text,
+joined like in training, or whichever of them exists) are scored in
+chunks, one sparse transform + decision per chunk, across a process pool.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from models.explain import DEFAULT_TOP_K, explain_rows, format_explanation
+from models.pipeline import PIPELINE_PATH, load_model_components
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _decide(model, X):
+    """(label indices into model.classes_, confidences 0-100) for a feature matrix"""
+    scores = model.decision_function(X)
+    if scores.ndim == 1:
+        # Binary case: identical to model.predict and
+        # max(model._predict_proba_lr) without computing the decision twice
+        return (scores > 0).astype(int), expit(np.abs(scores)) * 100
+    return scores.argmax(axis=1), model._predict_proba_lr(X).max(axis=1) * 100
+
+
+def predict_batch(model, vectorizer, texts):
+    """
+    Score a list of articles in one vectorizer/model call.
+    `vectorizer` is anything with transform(texts), e.g. the preprocess +
+    vectorizer steps of the pipeline artifact.
+    Returns (labels, confidences) as arrays; confidence is 0-100 like the app.
+    """
+    indices, confidences = _decide(model, vectorizer.transform(texts))
+    return model.classes_[indices], confidences
+
+
+def predict_batch_explained(model, vectorizer, texts, top_k=DEFAULT_TOP_K):
+    """
+    predict_batch plus, per article, the top_k (token, contribution) pairs
+    behind its label, computed from the same sparse rows.
+    Returns (labels, confidences, explanations)
+    """
+    X = vectorizer.transform(texts)
+    indices, confidences = _decide(model, X)
+    explanations = explain_rows(model, vectorizer, texts, X, indices, top_k)
+    return model.classes_[indices], confidences, explanations
+
+
+# ==============================================
+# Worker processes
+# ==============================================
+_worker_model = None
+_worker_vectorizer = None
+
+
+def _init_worker(pipeline_path, model_path, vectorizer_path):
+    global _worker_model, _worker_vectorizer
+    _worker_model, _worker_vectorizer = load_model_components(pipeline_path, model_path, vectorizer_path)
+
+
+def _score_chunk(texts, explain=0):
+    if explain:
+        return predict_batch_explained(_worker_model, _worker_vectorizer, texts, explain)
+    return predict_batch(_worker_model, _worker_vectorizer, texts)
+
+
+# ==============================================
+# File I/O
+# ==============================================
+def _read_chunks(path, chunk_size):
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return pd.read_json(path, lines=True, chunksize=chunk_size)
+    return pd.read_csv(path, chunksize=chunk_size)
+
+
+def _chunk_texts(chunk, text_columns):
+    columns = [c for c in text_columns if c in chunk.columns]
+    if not columns:
+        raise ValueError(f"None of the text columns {text_columns} found in input")
+    texts = chunk[columns[0]].fillna('').astype(str)
+    for column in columns[1:]:
+        texts = texts + ' ' + chunk[column].fillna('').astype(str)
+    return texts.tolist()
+
+
+def _write_chunk(frame, path, first):
+    if path.endswith('.jsonl'):
+        with open(path, 'w' if first else 'a', encoding='utf-8') as f:
+            frame.to_json(f, orient='records', lines=True)
+    else:
+        frame.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+def score_file(input_path, output_path, pipeline_path=PIPELINE_PATH,
+               model_path='model.pkl', vectorizer_path='vectorizer.pkl', text_columns=('title', 'text'), id_column=None,
+               chunk_size=DEFAULT_CHUNK_SIZE, workers=None, explain=0):
+    """
+    Score every article in input_path and write label/confidence rows to
+    output_path (CSV or JSONL by extension), preserving input order.
+    With explain=k a top_tokens column lists the k tokens behind each label.
+    Uses pipeline_path when it exists, else the separate model/vectorizer.
+    At most 2 x workers chunks are in flight, so memory stays bounded.
+    Returns (articles scored, seconds taken)
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    total = 0
+    pending = deque()
+    first = True
+
+    def drain_one():
+        nonlocal first, total
+        ids, future = pending.popleft()
+        labels, confidences, *explanations = future.result()
+        frame = pd.DataFrame({'id': ids, 'prediction': labels, 'confidence': confidences.round(2)})
+        if explanations:
+            frame['top_tokens'] = [format_explanation(e) for e in explanations[0]]
+        _write_chunk(frame, output_path, first)
+        first = False
+        total += len(frame)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pipeline_path, model_path, vectorizer_path)) as executor:
+        offset = 0
+        for chunk in _read_chunks(input_path, chunk_size):
+            ids = chunk[id_column].tolist() if id_column else list(range(offset, offset + len(chunk)))
+            offset += len(chunk)
+            pending.append((ids, executor.submit(_score_chunk, _chunk_texts(chunk, text_columns), explain)))
+            if len(pending) >= 2 * workers:
+                drain_one()
+        while pending:
+            drain_one()
+
+    return total, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score news articles in bulk")
+    parser.add_argument('input', help="CSV or JSONL file of articles")
+    parser.add_argument('output', help="CSV or JSONL file for predictions")
+    parser.add_argument('--pipeline', default=PIPELINE_PATH,
+                        help="preprocessor + vectorizer + classifier artifact")
+    parser.add_argument('--model', default='model.pkl', help="used when --pipeline does not exist")
+    parser.add_argument('--vectorizer', default='vectorizer.pkl')
+    parser.add_argument('--text-columns', default='title,text',
+                        help="comma-separated columns joined into the article text")
+    parser.add_argument('--id-column', default=None, help="column copied to the output as id")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="default: all cores")
+    parser.add_argument('--explain', type=int, default=0, metavar='K',
+                        help="add a top_tokens column with the K tokens behind each label")
+    args = parser.parse_args(argv)
+
+    total, elapsed = score_file(
+        args.input, args.output, args.pipeline, args.model, args.vectorizer,
+        text_columns=tuple(args.text_columns.split(',')), id_column=args.id_column,
+        chunk_size=args.chunk_size, workers=args.workers, explain=args.explain
+    )
+    print(f"Scored {total} articles in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} articles/sec)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Compact, memory-mapped export of a TF-IDF pipeline.
+
+Usage (from the src/ directory):
+    python -m models.compact export pipeline.pkl pipeline_compact
+    python -m models.compact bench --pipeline pipeline.pkl --compact pipeline_compact --sample news.csv
+
+Unpickling the pipeline rebuilds the TF-IDF vocabulary (and the lemma
+table) as Python dicts with hundreds of thousands of string keys, in
+every process. The compact format stores instead:
+
+    vocab_hashes.npy   sorted 64-bit term hashes; a term's column is its
+                       position, so idf/coef are permuted to match
+    word_hashes.npy    sorted hashes of every word in the lemma table, and
+    word_columns.npy   the column its lemma maps to (-1 for stopwords and
+                       words outside the vocabulary)
+    term_bytes.npy     the terms themselves, UTF-8 concatenated in column
+    term_offsets.npy   order, read back only to name explanation tokens
+    idf.npy, coef.npy, intercept.npy, classes.npy
+    meta.json          format version and the vectorizer settings used
+
+Arrays are opened with mmap_mode='r', so loading is near-instant and
+every worker process shares the same page-cache copy. Lookups are a
+vectorized searchsorted over the hash arrays; hashes are checked for
+collisions at export time.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from models.pipeline import PIPELINE_PATH, load_pipeline
+from models.preprocess import _NON_LETTERS, lemmatize
+
+COMPACT_PATH = os.getenv('MODEL_COMPACT_DIR', 'pipeline_compact')
+FORMAT_VERSION = 1
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+ANALYZER_PARAMS = ('lowercase', 'token_pattern', 'ngram_range', 'stop_words', 'strip_accents', 'analyzer')
+WEIGHTING_PARAMS = ('norm', 'use_idf', 'sublinear_tf', 'binary')
+
+
+def _term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), 'little')
+
+
+def _hashes(terms):
+    return np.fromiter((_term_hash(t) for t in terms), dtype=np.uint64, count=len(terms))
+
+
+def _lookup(sorted_hashes, hashes):
+    """Positions of hashes in sorted_hashes, -1 where absent"""
+    if not len(sorted_hashes):
+        return np.full(len(hashes), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_hashes, hashes)
+    positions[positions == len(sorted_hashes)] = 0
+    return np.where(sorted_hashes[positions] == hashes, positions, -1)
+
+
+def _sorted_unique(hashes, what):
+    order = np.argsort(hashes, kind='stable')
+    ordered = hashes[order]
+    if len(ordered) > 1 and not np.all(np.diff(ordered)):
+        raise ValueError(f"64-bit hash collision in the {what}; cannot export")
+    return order, ordered
+
+
+# ==============================================
+# Export
+# ==============================================
+def export_compact(out_dir, pipeline=None, model=None, vectorizer=None):
+    """Write the compact format for a TF-IDF pipeline (or a legacy model/vectorizer pair)"""
+    preprocessor = None
+    if pipeline is not None:
+        preprocessor = pipeline.named_steps.get('preprocess')
+        vectorizer = pipeline.named_steps['vectorizer']
+        model = pipeline.named_steps['classifier']
+    if not hasattr(vectorizer, 'vocabulary_'):
+        raise ValueError("Only vocabulary-based (TF-IDF) pipelines need exporting; hashed ones hold no vocabulary")
+
+    params = vectorizer.get_params()
+    if callable(params['analyzer']) or params['tokenizer'] or params['preprocessor']:
+        raise ValueError("Vectorizers with custom callables cannot be exported")
+    if preprocessor is not None and (params['ngram_range'] != (1, 1) or params['analyzer'] != 'word'
+                                     or params['token_pattern'] != DEFAULT_TOKEN_PATTERN):
+        raise ValueError("The word table requires a unigram vectorizer with the default token pattern")
+    stop_words = params['stop_words']
+    if isinstance(stop_words, (set, frozenset, list, tuple)):
+        stop_words = sorted(stop_words)
+
+    terms = list(vectorizer.vocabulary_)
+    order, vocab_hashes = _sorted_unique(_hashes(terms), 'vocabulary')
+    old_columns = np.fromiter((vectorizer.vocabulary_[terms[i]] for i in order), dtype=np.int64, count=len(terms))
+
+    arrays = {
+        'vocab_hashes': vocab_hashes,
+        'coef': np.ascontiguousarray(model.coef_[:, old_columns], dtype=np.float64),
+        'intercept': np.asarray(model.intercept_, dtype=np.float64),
+        'classes': np.asarray(model.classes_).astype(str),
+    }
+    encoded = [terms[i].encode() for i in order]
+    arrays['term_bytes'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    arrays['term_offsets'] = np.concatenate(([0], np.cumsum([len(t) for t in encoded]))).astype(np.int64)
+    if getattr(vectorizer, 'use_idf', False):
+        arrays['idf'] = np.asarray(vectorizer.idf_, dtype=np.float64)[old_columns]
+
+    if preprocessor is not None:
+        words = list(preprocessor.lemmas_)
+        word_order, word_hashes = _sorted_unique(_hashes(words), 'lemma table')
+        lemmas = [preprocessor.lemmas_[words[i]] for i in word_order]
+        columns = _lookup(vocab_hashes, _hashes(lemmas))
+        columns[[not lemma for lemma in lemmas]] = -1
+        arrays['word_hashes'] = word_hashes
+        arrays['word_columns'] = columns.astype(np.int32)
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'n_features': len(terms),
+        'word_table': preprocessor is not None,
+        'terms': True,
+        'analyzer': {k: params[k] for k in ANALYZER_PARAMS},
+        'weighting': {k: params.get(k) for k in WEIGHTING_PARAMS},
+    }
+    meta['analyzer']['stop_words'] = stop_words
+
+    # Build next to the target and swap directories, so loaders never see a partial export
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+    return meta
+
+
+# ==============================================
+# Loading
+# ==============================================
+class CompactFeaturizer:
+    """TF-IDF features from the compact arrays; transform() matches the pipeline's"""
+
+    def __init__(self, path, meta):
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+        self.n_features = meta['n_features']
+        self.vocab_hashes = load('vocab_hashes')
+        self.idf = load('idf') if meta['weighting']['use_idf'] else None
+        self.weighting = meta['weighting']
+        if meta.get('terms'):
+            self.term_bytes = load('term_bytes')
+            self.term_offsets = load('term_offsets')
+        else:
+            self.term_bytes = self.term_offsets = None
+        if meta['word_table']:
+            self.word_hashes = load('word_hashes')
+            self.word_columns = load('word_columns')
+            self._analyzer = None
+        else:
+            analyzer_params = dict(meta['analyzer'], ngram_range=tuple(meta['analyzer']['ngram_range']))
+            self._analyzer = TfidfVectorizer(**analyzer_params).build_analyzer()
+
+    def _columns(self, text):
+        if self._analyzer is not None:
+            return _lookup(self.vocab_hashes, _hashes(self._analyzer(text)))
+        words = _NON_LETTERS.sub('', text.lower()).split()
+        hashes = _hashes(words)
+        positions = _lookup(self.word_hashes, hashes)
+        columns = np.where(positions >= 0, self.word_columns[np.maximum(positions, 0)], -1)
+        for i in np.flatnonzero(positions < 0):
+            # Word not seen in training: lemmatize it now (LRU-cached)
+            lemma = lemmatize(words[i])
+            columns[i] = _lookup(self.vocab_hashes, _hashes([lemma]))[0]
+        return columns
+
+    def feature_names(self, columns):
+        """Terms for the given columns ('#column' for exports without a term table)"""
+        if self.term_bytes is None:
+            return [f"#{c}" for c in columns]
+        offsets = self.term_offsets
+        return [self.term_bytes[offsets[c]:offsets[c + 1]].tobytes().decode() for c in columns]
+
+    def transform(self, texts):
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            columns = self._columns(text)
+            doc_columns, doc_counts = np.unique(columns[columns >= 0], return_counts=True)
+            indices.append(doc_columns)
+            counts.append(doc_counts)
+            indptr.append(indptr[-1] + len(doc_columns))
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        data = np.concatenate(counts).astype(np.float64) if counts else np.empty(0)
+
+        if self.weighting['binary']:
+            data[:] = 1.0
+        elif self.weighting['sublinear_tf']:
+            data = np.log(data) + 1.0
+        if self.idf is not None:
+            data *= self.idf[indices]
+        X = sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, self.n_features))
+        if self.weighting['norm']:
+            X = normalize(X, norm=self.weighting['norm'], copy=False)
+        return X
+
+
+class CompactClassifier:
+    """Linear decision function over memory-mapped coefficients"""
+
+    def __init__(self, path):
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+        self.coef_ = load('coef')
+        self.intercept_ = np.asarray(load('intercept'))
+        self.classes_ = np.asarray(load('classes'))
+
+    def decision_function(self, X):
+        scores = np.asarray(X @ self.coef_.T) + self.intercept_
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def _predict_proba_lr(self, X):
+        prob = expit(self.decision_function(X))
+        if prob.ndim == 1:
+            return np.vstack([1 - prob, prob]).T
+        return prob / prob.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            return self.classes_[(scores > 0).astype(int)]
+        return self.classes_[scores.argmax(axis=1)]
+
+
+def load_compact(path=COMPACT_PATH):
+    """(classifier, featurizer) for models.batch_score.predict_batch"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format: {meta.get('format')}")
+    return CompactClassifier(path), CompactFeaturizer(path, meta)
+
+
+# ==============================================
+# Benchmark
+# ==============================================
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(kind, path):
+    """Run in a fresh interpreter: load one format and report time and RSS growth"""
+    from models.batch_score import predict_batch
+    before = _rss_mb()
+    start = time.perf_counter()
+    if kind == 'pickle':
+        pipeline = load_pipeline(path)
+        model, featurizer = pipeline[-1], pipeline[:-1]
+    else:
+        model, featurizer = load_compact(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    predict_batch(model, featurizer, ["warm up the first request"])
+    print(json.dumps({'load_ms': load_ms, 'rss_mb': _rss_mb() - before}))
+
+
+def benchmark(pipeline_path, compact_path, sample_path=None, runs=3):
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src_dir, os.getenv('PYTHONPATH')])))
+    results = {}
+    for kind, path in (('pickle', pipeline_path), ('compact', compact_path)):
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, '-c', f"from models.compact import _measure; _measure({kind!r}, {path!r})"],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+        results[kind] = {
+            'load_ms': min(s['load_ms'] for s in samples),
+            'rss_mb': min(s['rss_mb'] for s in samples),
+        }
+        print(f"{kind:>8}: load {results[kind]['load_ms']:8.1f} ms   RSS +{results[kind]['rss_mb']:7.1f} MB")
+
+    if sample_path:
+        import pandas as pd
+        from models.batch_score import _chunk_texts, predict_batch
+        texts = _chunk_texts(pd.read_csv(sample_path, nrows=2000), ('title', 'text'))
+        pipeline = load_pipeline(pipeline_path)
+        _, expected = predict_batch(pipeline[-1], pipeline[:-1], texts)
+        _, actual = predict_batch(*load_compact(compact_path), texts)
+        print(f"Max confidence difference on {len(texts)} samples: {np.abs(expected - actual).max():.2e}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or benchmark the compact model format")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export')
+    export.add_argument('pipeline', nargs='?', default=PIPELINE_PATH)
+    export.add_argument('output', nargs='?', default=COMPACT_PATH)
+    bench = sub.add_parser('bench')
+    bench.add_argument('--pipeline', default=PIPELINE_PATH)
+    bench.add_argument('--compact', default=COMPACT_PATH)
+    bench.add_argument('--sample', default=None, help="labelled CSV to check both formats agree")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        meta = export_compact(args.output, pipeline=load_pipeline(args.pipeline))
+        print(f"Exported {meta['n_features']} features to {args.output}")
+    else:
+        benchmark(args.pipeline, args.compact, args.sample)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
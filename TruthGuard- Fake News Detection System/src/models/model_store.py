@@ -0,0 +1,151 @@
+"""
+Versioned model files with hot reload.
+
+    model_versions/
+        pipeline-v0001.pkl
+        pipeline-v0002.pkl
+        pipeline-v0002_compact/   memory-mapped copy (TF-IDF pipelines only)
+        current.json      {"version": 2, "file": "pipeline-v0002.pkl", "feedback_id": 1234, ...}
+
+publish() writes a new pipeline file and then replaces current.json with
+os.replace, so readers see either the old or the new version, never a
+partial one. ModelStore.components() checks current.json at most every
+check_interval seconds; when the version changes, the new pipeline is
+loaded on a background thread and swapped in once ready, so requests
+keep being served by the previous model meanwhile.
+
+TF-IDF versions are also exported in the compact format (models/compact.py)
+and served from it, like pipeline_compact/ is for the deployed model.
+Without current.json the store serves pipeline.pkl (or the legacy
+model.pkl/vectorizer.pkl pair) like load_model_components().
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from models.pipeline import PIPELINE_PATH, load_model_components, load_pipeline, save_pipeline
+
+MODEL_DIR = os.getenv('MODEL_DIR', 'model_versions')
+MANIFEST_NAME = 'current.json'
+KEEP_VERSIONS = 5
+
+
+def read_manifest(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(model_dir, manifest):
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def publish(pipeline, model_dir=MODEL_DIR, keep=KEEP_VERSIONS, log=print, **metadata):
+    """Save pipeline as the next version and make it current. Returns the manifest"""
+    os.makedirs(model_dir, exist_ok=True)
+    previous = read_manifest(model_dir) or {}
+    version = previous.get('version', 0) + 1
+    filename = f"pipeline-v{version:04d}.pkl"
+    save_pipeline(pipeline, os.path.join(model_dir, filename))
+    compact = None
+    if hasattr(pipeline.named_steps['vectorizer'], 'vocabulary_'):
+        from models.compact import export_compact
+        compact = f"pipeline-v{version:04d}_compact"
+        try:
+            export_compact(os.path.join(model_dir, compact), pipeline=pipeline)
+        except ValueError as error:
+            log(f"Serving version {version} from the pickle: {error}")
+            compact = None
+
+    manifest = dict(previous, **metadata)
+    manifest.update(version=version, file=filename, compact=compact,
+                    created=datetime.now().isoformat(timespec='seconds'))
+    _write_manifest(model_dir, manifest)
+
+    # Old versions stay around for rollback, up to `keep`
+    for old in range(version - keep, 0, -1):
+        old_path = os.path.join(model_dir, f"pipeline-v{old:04d}.pkl")
+        if not os.path.exists(old_path):
+            break
+        os.remove(old_path)
+        shutil.rmtree(os.path.join(model_dir, f"pipeline-v{old:04d}_compact"), ignore_errors=True)
+    return manifest
+
+
+def update_checkpoint(model_dir=MODEL_DIR, **metadata):
+    """Record metadata (e.g. the feedback checkpoint) without publishing a new version"""
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No {MANIFEST_NAME} in {model_dir}")
+    manifest.update(metadata)
+    _write_manifest(model_dir, manifest)
+    return manifest
+
+
+def load_current(model_dir=MODEL_DIR, fallback_path=PIPELINE_PATH):
+    """(manifest or None, pipeline) for the current version, or fallback_path"""
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        return None, load_pipeline(fallback_path)
+    return manifest, load_pipeline(os.path.join(model_dir, manifest['file']))
+
+
+class ModelStore:
+    """The serving model, swapped atomically when a new version is published"""
+
+    def __init__(self, model_dir=MODEL_DIR, check_interval=5.0, on_error=print):
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._loading = False
+        self._next_check = 0.0
+        self.version = None
+        manifest = read_manifest(model_dir)
+        if manifest is None:
+            self._components = load_model_components()
+        else:
+            self._components = self._load(manifest)
+            self.version = manifest['version']
+
+    def _load(self, manifest):
+        if manifest.get('compact'):
+            from models.compact import load_compact
+            return load_compact(os.path.join(self.model_dir, manifest['compact']))
+        pipeline = load_pipeline(os.path.join(self.model_dir, manifest['file']))
+        return pipeline[-1], pipeline[:-1]
+
+    def _reload(self, manifest):
+        try:
+            components = self._load(manifest)
+            with self._lock:
+                # One tuple assignment: readers get the old or the new pair, never a mix
+                self._components = components
+                self.version = manifest['version']
+        except Exception as error:
+            self.on_error(f"Could not load model version {manifest.get('version')}: {error}")
+        finally:
+            self._loading = False
+
+    def components(self):
+        """(classifier, featurizer) for predict_batch; never blocks on a reload"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check and not self._loading:
+                    self._next_check = now + self.check_interval
+                    manifest = read_manifest(self.model_dir)
+                    if manifest is not None and manifest['version'] != self.version:
+                        self._loading = True
+                        threading.Thread(target=self._reload, args=(manifest,),
+                                         name="model-reload", daemon=True).start()
+        return self._components
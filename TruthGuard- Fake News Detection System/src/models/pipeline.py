@@ -0,0 +1,134 @@
+"""
+The serialized model artifact: preprocessor + TF-IDF vectorizer +
+classifier in one sklearn Pipeline, so serving applies exactly the
+preprocessing the vectorizer was fitted on.
+
+    pipeline = load_pipeline('pipeline.pkl')
+    pipeline.predict(["raw article text"])
+
+The preprocessor carries a token -> lemma table built from the training
+corpus, so per-request preprocessing is one compiled regex and a dict
+lookup per token; WordNet is only consulted for tokens never seen in
+training.
+"""
+import os
+import pickle
+
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+from models.preprocess import STOP_WORDS, _NON_LETTERS, lemmatize
+
+PIPELINE_PATH = os.getenv('MODEL_PIPELINE', 'pipeline.pkl')
+
+
+class TextPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    Same output as models.preprocess.preprocess_text, with a precomputed
+    lemma table of at most max_lemmas tokens (rarer tokens fall back to
+    the LRU-cached lemmatizer).
+    """
+
+    def __init__(self, max_lemmas=500000):
+        self.max_lemmas = max_lemmas
+
+    def fit(self, X, y=None):
+        self.__dict__.pop('lemmas_', None)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        """Add the tokens of X to the lemma table (streaming training and updates)"""
+        if not hasattr(self, 'lemmas_'):
+            # '' marks stopwords, so transform needs a single lookup per token
+            self.lemmas_ = dict.fromkeys(STOP_WORDS, '')
+        table = self.lemmas_
+        for text in X:
+            for word in _NON_LETTERS.sub('', text.lower()).split():
+                if word not in table:
+                    if len(table) >= self.max_lemmas:
+                        return self
+                    table[word] = lemmatize(word)
+        return self
+
+    def partial_fit_transform(self, X):
+        """partial_fit(X) then transform(X), tokenizing each text once"""
+        if not hasattr(self, 'lemmas_'):
+            self.lemmas_ = dict.fromkeys(STOP_WORDS, '')
+        table = self.lemmas_
+        out = []
+        for text in X:
+            words = []
+            for word in _NON_LETTERS.sub('', text.lower()).split():
+                lemma = table.get(word)
+                if lemma is None:
+                    lemma = lemmatize(word)
+                    if len(table) < self.max_lemmas:
+                        table[word] = lemma
+                if lemma:
+                    words.append(lemma)
+            out.append(' '.join(words))
+        return out
+
+    def transform(self, X):
+        lemmas = self.lemmas_
+        out = []
+        for text in X:
+            words = []
+            for word in _NON_LETTERS.sub('', text.lower()).split():
+                lemma = lemmas.get(word)
+                if lemma is None:
+                    # Unseen token: bounded LRU over WordNet
+                    lemma = lemmatize(word)
+                if lemma:
+                    words.append(lemma)
+            out.append(' '.join(words))
+        return out
+
+
+def build_pipeline(preprocessor, vectorizer, classifier):
+    return Pipeline([
+        ('preprocess', preprocessor),
+        ('vectorizer', vectorizer),
+        ('classifier', classifier),
+    ])
+
+
+def save_pipeline(pipeline, path=PIPELINE_PATH):
+    # Write to a temporary file first so a running app never reads half a model
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(pipeline, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_pipeline(path=PIPELINE_PATH):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_model_components(pipeline_path=PIPELINE_PATH, model_path='model.pkl',
+                          vectorizer_path='vectorizer.pkl', compact_path=None):
+    """
+    Returns (classifier, featurizer) for models.batch_score.predict_batch.
+    Prefers the memory-mapped export (models/compact.py) when it is at
+    least as new as pipeline.pkl, then pipeline.pkl itself, whose
+    featurizer is the preprocess + vectorizer steps. Older deployments
+    without pipeline.pkl fall back to the separate pickles, which
+    vectorize raw text.
+    """
+    from models.compact import COMPACT_PATH, load_compact
+
+    compact_path = compact_path or COMPACT_PATH
+    compact_meta = os.path.join(compact_path, 'meta.json')
+    if os.path.exists(compact_meta):
+        if not os.path.exists(pipeline_path) or os.path.getmtime(compact_meta) >= os.path.getmtime(pipeline_path):
+            return load_compact(compact_path)
+        print(f"Ignoring {compact_path}: older than {pipeline_path}; re-run models.compact export")
+    if os.path.exists(pipeline_path):
+        pipeline = load_pipeline(pipeline_path)
+        return pipeline[-1], pipeline[:-1]
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(vectorizer_path, 'rb') as f:
+        vectorizer = pickle.load(f)
+    return model, vectorizer
@@ -0,0 +1,194 @@
+"""
+Prediction cache keyed on a normalized article fingerprint.
+
+The same story pasted again (different whitespace or case) maps to the
+same fingerprint and gets the stored label, confidence and prediction_id
+back without running the model or writing a new prediction row. Entries
+are kept in a bounded LRU with a TTL and are tied to the model version
+that produced them, so a hot-reloaded model never serves stale results.
+
+Optional tiers:
+    minhash=True   near-duplicate lookup (MinHash over word 3-grams with
+                   LSH banding); catches edited copies of the same article
+    db=...         persistent tier in the prediction_fingerprints table,
+                   shared by all app processes and surviving restarts
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', 24 * 3600))  # seconds
+CACHE_MINHASH = os.getenv('PREDICTION_CACHE_MINHASH', '0') == '1'
+CACHE_PERSIST = os.getenv('PREDICTION_CACHE_PERSIST', '0') == '1'
+
+NUM_PERM = 64
+BANDS = 8  # 8 bands x 8 rows: candidates from ~0.77 Jaccard up
+SIMILARITY_THRESHOLD = 0.9
+SHINGLE_SIZE = 3
+
+_WHITESPACE = re.compile(r'\s+')
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+# top_tokens is only kept in memory; persistent-tier hits come back without it
+CachedPrediction = namedtuple('CachedPrediction', 'label confidence prediction_id top_tokens', defaults=(None,))
+
+
+def normalize(text):
+    return _WHITESPACE.sub(' ', text).strip().lower()
+
+
+def _digest(normalized_text):
+    return hashlib.blake2b(normalized_text.encode(), digest_size=16).hexdigest()
+
+
+def fingerprint(text):
+    """Hex digest of the normalized text"""
+    return _digest(normalize(text))
+
+
+def minhash(normalized_text):
+    """NUM_PERM-value MinHash signature of the word 3-grams"""
+    words = normalized_text.split(' ')
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE])
+                for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p with 31-bit a, b and 32-bit x stays below 2**64
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def _bands(signature):
+    rows = NUM_PERM // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+
+
+class _Entry:
+    __slots__ = ('result', 'version', 'expires', 'bands', 'signature')
+
+    def __init__(self, result, version, expires, signature=None):
+        self.result = result
+        self.version = version
+        self.expires = expires
+        self.signature = signature
+        self.bands = _bands(signature) if signature is not None else ()
+
+
+class PredictionCache:
+    """Bounded LRU/TTL cache of predictions by article fingerprint"""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, use_minhash=CACHE_MINHASH,
+                 db=None, threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_minhash = use_minhash
+        self.db = db
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ==============================================
+    # Internal index
+    # ==============================================
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        for band in entry.bands:
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _live(self, key, version, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < now or entry.version != version:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _near_duplicate(self, signature, version, now):
+        candidates = set()
+        for band in _bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        best, best_similarity = None, self.threshold
+        for key in candidates:
+            entry = self._live(key, version, now)
+            if entry is None or entry.signature is None:
+                continue
+            similarity = float(np.mean(entry.signature == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return best
+
+    # ==============================================
+    # Public API
+    # ==============================================
+    def get(self, text, model_version=0):
+        """CachedPrediction for text (or a near-duplicate), or None"""
+        normalized = normalize(text)
+        key = _digest(normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, model_version, now)
+            if entry is not None:
+                self.hits += 1
+                return entry.result
+
+        signature = minhash(normalized) if self.use_minhash else None
+        if signature is not None:
+            with self._lock:
+                entry = self._near_duplicate(signature, model_version, now)
+                if entry is not None:
+                    # Remember the exact text too, so the next paste is a plain lookup
+                    self._insert(key, _Entry(entry.result, model_version, entry.expires, signature))
+                    self.hits += 1
+                    return entry.result
+
+        if self.db is not None:
+            row = self.db.find_cached_prediction(key, model_version, self.ttl)
+            if row is not None:
+                result = CachedPrediction(*row)
+                with self._lock:
+                    self._insert(key, _Entry(result, model_version, now + self.ttl, signature))
+                    self.hits += 1
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, label, confidence, prediction_id, model_version=0, top_tokens=None):
+        """Cache a fresh prediction; also queued for the persistent tier when enabled"""
+        normalized = normalize(text)
+        key = _digest(normalized)
+        signature = minhash(normalized) if self.use_minhash else None
+        result = CachedPrediction(label, float(confidence), prediction_id, top_tokens)
+        with self._lock:
+            self._insert(key, _Entry(result, model_version, time.monotonic() + self.ttl, signature))
+        if self.db is not None and prediction_id is not None:
+            self.db.save_fingerprint(key, prediction_id, model_version, self.ttl)
+        return result
@@ -0,0 +1,200 @@
+"""
+Feedback-driven model refresh.
+
+Usage (from the src/ directory):
+    python -m models.refresh --holdout holdout.csv --interval 600
+    python -m models.refresh --holdout holdout.csv --once
+
+Each run pulls feedback rows newer than the checkpoint in current.json,
+applies partial_fit updates to a copy of the current pipeline and scores
+both models on a labelled holdout file. The update is published as a new
+version (see models/model_store.py) unless holdout accuracy drops by more
+than max_drop; either way the checkpoint moves past the rows it used.
+Serving processes pick the new version up on their next check, so the
+job never blocks or restarts the app. Retraining is CPU-bound, so it
+always runs in its own process: the command above, or a child process
+the app starts via RefreshJob. Feedback is streamed from a server-side
+cursor in chunks, never loaded whole.
+"""
+import argparse
+import atexit
+import os
+import subprocess
+import sys
+import time
+from itertools import chain
+
+import numpy as np
+
+from models.model_store import MODEL_DIR, load_current, publish, update_checkpoint
+from models.stream_train import (DEFAULT_CHUNK_SIZE, NotUpdatableError, check_updatable, feedback_batches,
+                                 labelled_batches, train_stream)
+
+HOLDOUT_PATH = os.getenv('MODEL_HOLDOUT')
+REFRESH_INTERVAL = float(os.getenv('MODEL_REFRESH_INTERVAL', 0))  # seconds; 0 = off
+MIN_FEEDBACK_ROWS = int(os.getenv('MODEL_REFRESH_MIN_ROWS', 20))
+MAX_HOLDOUT_ROWS = 20000
+
+
+def load_holdout(path, max_rows=MAX_HOLDOUT_ROWS):
+    """(texts, processed or None, labels) for up to max_rows rows of a labelled file"""
+    texts, processed, labels = [], [], []
+    for chunk_texts, chunk_processed, chunk_labels in labelled_batches(path):
+        texts += chunk_texts
+        labels += chunk_labels
+        if chunk_processed is None:
+            processed = None
+        elif processed is not None:
+            processed += chunk_processed
+        if len(labels) >= max_rows:
+            break
+    if processed is not None:
+        processed = processed[:max_rows]
+    return texts[:max_rows], processed, np.asarray(labels[:max_rows])
+
+
+def holdout_accuracy(pipeline, holdout):
+    texts, processed, labels = holdout
+    if processed is not None:
+        X = pipeline.named_steps['vectorizer'].transform(processed)
+        predictions = pipeline.named_steps['classifier'].predict(X)
+    else:
+        predictions = pipeline.predict(texts)
+    return float((predictions == labels).mean())
+
+
+def refresh_once(db, model_dir=MODEL_DIR, holdout=None, min_rows=MIN_FEEDBACK_ROWS,
+                 max_drop=0.01, log=print, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    One refresh cycle. Returns the new manifest if a version was published,
+    else None (not enough feedback, or the update failed the holdout check).
+    Raises NotUpdatableError, before publishing anything, for pipelines
+    that cannot learn incrementally.
+    """
+    manifest, pipeline = load_current(model_dir)
+    check_updatable(pipeline)
+    if manifest is None:
+        # First run: version the deployed pipeline.pkl so there is a checkpoint to advance
+        manifest = publish(pipeline, model_dir, log=log, feedback_id=0)
+    checkpoint = manifest.get('feedback_id', 0)
+    classes = tuple(pipeline.named_steps['classifier'].classes_)
+
+    batches = feedback_batches(db, classes, checkpoint, chunk_size)
+    try:
+        # Only buffer enough batches to know whether min_rows is reached
+        head, rows = [], 0
+        for batch in batches:
+            head.append(batch)
+            rows += len(batch[2])
+            if rows >= min_rows:
+                break
+        if rows < min_rows:
+            return None
+
+        last_feedback_id = checkpoint
+        def tracked():
+            nonlocal last_feedback_id
+            for batch in chain(head, batches):
+                last_feedback_id = batch[3]
+                yield batch
+
+        baseline = holdout_accuracy(pipeline, holdout) if holdout is not None else None
+        rows, _, _ = train_stream(pipeline, tracked(), classes)
+        accuracy = holdout_accuracy(pipeline, holdout) if holdout is not None else None
+    finally:
+        batches.close()
+
+    if baseline is not None and accuracy < baseline - max_drop:
+        log(f"Rejected update from {rows} feedback rows: holdout accuracy "
+            f"{accuracy * 100:.2f}% vs {baseline * 100:.2f}%")
+        update_checkpoint(model_dir, feedback_id=last_feedback_id)
+        return None
+
+    published = publish(pipeline, model_dir, log=log, feedback_id=last_feedback_id,
+                        feedback_rows=rows, holdout_accuracy=accuracy)
+    log(f"Published model v{published['version']} from {rows} feedback rows"
+        + (f" (holdout accuracy {accuracy * 100:.2f}%)" if accuracy is not None else ""))
+    return published
+
+
+class RefreshJob:
+    """
+    Runs this module's refresh loop as a child process, so retraining never
+    competes with the app's request threads for the GIL. The child is
+    stopped with the parent.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL or 600, model_dir=MODEL_DIR,
+                 holdout_path=HOLDOUT_PATH, min_rows=MIN_FEEDBACK_ROWS):
+        self.interval = interval
+        self.model_dir = model_dir
+        self.holdout_path = holdout_path
+        self.min_rows = min_rows
+        self._process = None
+
+    def command(self):
+        command = [sys.executable, '-m', 'models.refresh', '--interval', str(self.interval),
+                   '--model-dir', self.model_dir, '--min-rows', str(self.min_rows)]
+        if self.holdout_path:
+            command += ['--holdout', self.holdout_path]
+        return command
+
+    def start(self):
+        # The child imports models.* like this process does
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [src_dir, env.get('PYTHONPATH')]))
+        self._process = subprocess.Popen(self.command(), env=env)
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=10):
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the model from user feedback")
+    parser.add_argument('--holdout', default=HOLDOUT_PATH, help="labelled CSV or Parquet file")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--interval', type=float, default=REFRESH_INTERVAL or 600, help="seconds")
+    parser.add_argument('--min-rows', type=int, default=MIN_FEEDBACK_ROWS)
+    parser.add_argument('--max-drop', type=float, default=0.01,
+                        help="largest accepted fall in holdout accuracy (0.01 = 1 point)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="feedback rows fetched and trained on at a time")
+    parser.add_argument('--once', action='store_true')
+    args = parser.parse_args(argv)
+
+    from database.db_utils import DatabaseManager
+    db = DatabaseManager()
+    holdout = load_holdout(args.holdout) if args.holdout else None
+    try:
+        while True:
+            try:
+                refresh_once(db, args.model_dir, holdout, args.min_rows, args.max_drop,
+                             chunk_size=args.chunk_size)
+            except NotUpdatableError as error:
+                # Retrying cannot help: stop instead of failing every cycle
+                print(f"Model refresh disabled: {error}")
+                return 1
+            except Exception as error:
+                if args.once:
+                    raise
+                print(f"Model refresh failed: {error}")
+            if args.once:
+                return
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Out-of-core training with hashed features and partial_fit.
+
+Usage (from the src/ directory):
+    python -m models.stream_train news.csv --output pipeline.pkl
+    python -m models.stream_train processed_news.parquet --chunk-size 10000
+    python -m models.stream_train new_articles.csv --update pipeline.pkl
+    python -m models.stream_train --update pipeline.pkl --feedback --feedback-since 1200
+
+The corpus is read a chunk at a time (CSV or Parquet) and each chunk is
+preprocessed, hashed and passed to PassiveAggressiveClassifier.partial_fit.
+HashingVectorizer keeps no vocabulary, so peak memory depends on the
+chunk size, not the corpus. Every chunk is scored before it is trained on
+(progressive validation), which gives a running accuracy without a
+separate holdout pass.
+
+The saved artifact is a regular pipeline.pkl (see models/pipeline.py) and
+can be updated later with more labelled rows or with user feedback.
+Pipelines trained by data/models/train_model.py can be updated too: their
+TF-IDF vocabulary stays frozen and only the classifier learns.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import PassiveAggressiveClassifier
+
+from models.batch_score import _chunk_texts
+from models.pipeline import (PIPELINE_PATH, TextPreprocessor, build_pipeline,
+                             load_pipeline, save_pipeline)
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_CLASSES = ('FAKE', 'REAL')
+N_FEATURES = 2 ** 20
+
+
+def build_streaming_pipeline(n_features=N_FEATURES, random_state=42):
+    """Untrained preprocess + HashingVectorizer + PassiveAggressive pipeline"""
+    return build_pipeline(
+        TextPreprocessor(),
+        HashingVectorizer(n_features=n_features, stop_words='english', alternate_sign=False),
+        PassiveAggressiveClassifier(random_state=random_state),
+    )
+
+
+class NotUpdatableError(ValueError):
+    """The pipeline cannot learn incrementally"""
+
+
+def check_updatable(pipeline):
+    """Raise NotUpdatableError unless update_pipeline/train_stream can train pipeline"""
+    vectorizer = pipeline.named_steps['vectorizer']
+    classifier = pipeline.named_steps['classifier']
+    if not isinstance(vectorizer, HashingVectorizer) and not hasattr(vectorizer, 'vocabulary_'):
+        raise NotUpdatableError("The vectorizer is neither hashed nor fitted; train it first")
+    if not hasattr(classifier, 'partial_fit'):
+        raise NotUpdatableError(
+            f"{type(classifier).__name__} has no partial_fit; retrain with stream_train or train_model.py"
+        )
+
+
+def _featurize(pipeline, texts, processed=None):
+    preprocessor = pipeline.named_steps['preprocess']
+    vectorizer = pipeline.named_steps['vectorizer']
+    check_updatable(pipeline)
+    if processed is None:
+        processed = preprocessor.partial_fit_transform(texts)
+    else:
+        preprocessor.partial_fit(texts)
+    # HashingVectorizer is stateless and a fitted TF-IDF vocabulary stays
+    # frozen: transform alone, no fitting
+    return vectorizer.transform(processed)
+
+
+def _partial_fit(classifier, X, labels, classes):
+    if hasattr(classifier, 'classes_'):
+        classifier.partial_fit(X, labels)
+    else:
+        classifier.partial_fit(X, labels, classes=np.asarray(classes))
+
+
+def update_pipeline(pipeline, texts, labels, classes=DEFAULT_CLASSES, processed=None):
+    """
+    One incremental step: extend the lemma table, hash, partial_fit.
+    `processed` may carry already-preprocessed texts (e.g. from
+    processed_news.parquet) to skip the preprocessing pass.
+    """
+    X = _featurize(pipeline, texts, processed)
+    _partial_fit(pipeline.named_steps['classifier'], X, labels, classes)
+    return pipeline
+
+
+# ==============================================
+# Data sources
+# ==============================================
+def _read_chunks(path, chunk_size):
+    if path.endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def labelled_batches(path, chunk_size=DEFAULT_CHUNK_SIZE, text_columns=('title', 'text'),
+                     label_column='label'):
+    """Yield (texts, processed texts or None, labels) per chunk of a labelled file"""
+    for chunk in _read_chunks(path, chunk_size):
+        chunk = chunk[chunk[label_column].notna()]
+        if chunk.empty:
+            continue
+        if 'processed_text' in chunk.columns:
+            # processed_news.parquet: 'text' already holds title + text
+            texts = chunk['text'].fillna('').astype(str).tolist()
+            processed = chunk['processed_text'].fillna('').astype(str).tolist()
+        else:
+            texts = _chunk_texts(chunk, text_columns)
+            processed = None
+        yield texts, processed, chunk[label_column].astype(str).tolist()
+
+
+def feedback_batches(db, classes, since_feedback_id=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (texts, None, labels, last feedback_id) from the feedback table,
+    oldest first. A prediction marked correct keeps its label; one marked
+    incorrect gets the other label (binary models only).
+    """
+    classes = [str(c) for c in classes]
+    with db.connection() as conn:
+        with conn.cursor(name='feedback_training') as cur:
+            cur.itersize = chunk_size
+            cur.execute(
+                """SELECT f.feedback_id, p.input_text, p.prediction_result, f.is_correct
+                FROM feedback f JOIN predictions p ON p.prediction_id = f.prediction_id
+                WHERE f.feedback_id > %s
+                ORDER BY f.feedback_id""",
+                (since_feedback_id,)
+            )
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    return
+                texts, labels = [], []
+                for _, text, predicted, is_correct in rows:
+                    if is_correct:
+                        label = predicted
+                    elif len(classes) == 2 and predicted in classes:
+                        label = classes[1 - classes.index(predicted)]
+                    else:
+                        continue
+                    texts.append(text)
+                    labels.append(label)
+                if texts:
+                    yield texts, None, labels, rows[-1][0]
+
+
+# ==============================================
+# Training loop
+# ==============================================
+def train_stream(pipeline, batches, classes=DEFAULT_CLASSES):
+    """
+    partial_fit the pipeline over an iterable of (texts, processed, labels, ...)
+    batches, scoring each batch before training on it.
+    Returns (rows trained, progressive accuracy or None, seconds taken)
+    """
+    start = time.perf_counter()
+    classifier = pipeline.named_steps['classifier']
+    total = scored = correct = 0
+    for texts, processed, labels, *_ in batches:
+        X = _featurize(pipeline, texts, processed)
+        if hasattr(classifier, 'classes_'):
+            correct += int((classifier.predict(X) == np.asarray(labels)).sum())
+            scored += len(labels)
+        _partial_fit(classifier, X, labels, classes)
+        total += len(labels)
+    return total, (correct / scored if scored else None), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or update the model out of core")
+    parser.add_argument('input', nargs='?', help="labelled CSV or Parquet file")
+    parser.add_argument('--output', default=None, help="default: the --update path, else pipeline.pkl")
+    parser.add_argument('--update', default=None, metavar='PIPELINE',
+                        help="continue training an existing hashed pipeline")
+    parser.add_argument('--feedback', action='store_true',
+                        help="also train on user feedback rows from the database")
+    parser.add_argument('--feedback-since', type=int, default=0, metavar='FEEDBACK_ID')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--classes', default=','.join(DEFAULT_CLASSES))
+    parser.add_argument('--n-features', type=int, default=N_FEATURES)
+    args = parser.parse_args(argv)
+    if not args.input and not args.feedback:
+        parser.error("give an input file, --feedback, or both")
+
+    pipeline = load_pipeline(args.update) if args.update else build_streaming_pipeline(args.n_features)
+    classifier = pipeline.named_steps['classifier']
+    classes = tuple(classifier.classes_) if hasattr(classifier, 'classes_') else tuple(args.classes.split(','))
+    output = args.output or args.update or PIPELINE_PATH
+
+    if args.input:
+        total, accuracy, elapsed = train_stream(
+            pipeline, labelled_batches(args.input, args.chunk_size), classes)
+        summary = f"Trained on {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec)"
+        if accuracy is not None:
+            summary += f"; progressive accuracy {accuracy * 100:.2f}%"
+        print(summary)
+
+    if args.feedback:
+        from database.db_utils import DatabaseManager
+        db = DatabaseManager()
+        last_id = args.feedback_since
+
+        def batches():
+            nonlocal last_id
+            for texts, processed, labels, batch_last_id in feedback_batches(
+                    db, classes, args.feedback_since, args.chunk_size):
+                last_id = batch_last_id
+                yield texts, processed, labels
+
+        try:
+            total, accuracy, elapsed = train_stream(pipeline, batches(), classes)
+        finally:
+            db.close()
+        print(f"Trained on {total} feedback rows up to feedback_id {last_id}")
+
+    save_pipeline(pipeline, output)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
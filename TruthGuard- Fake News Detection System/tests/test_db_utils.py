@@ -0,0 +1,52 @@
+import itertools
+import threading
+import time
+
+from database.db_utils import DatabaseManager
+
+
+def _manager(writes):
+    manager = DatabaseManager(flush_rows=100, flush_interval_ms=20, log=lambda message: None)
+    manager._next_prediction_id = itertools.count(1).__next__
+    written = threading.Event()
+
+    def write(batches, row_by_row=False):
+        writes.append([len(rows) for rows in batches])
+        written.set()
+    manager._write = write
+    return manager, written
+
+
+def test_fingerprint_after_flushed_prediction_is_written():
+    writes = []
+    manager, written = _manager(writes)
+    try:
+        prediction_id = manager.save_prediction("article", "FAKE", 0.9)
+        assert written.wait(2)
+        written.clear()
+
+        # PredictionCache.put queues the fingerprint after save_prediction returned
+        manager.save_fingerprint("f" * 32, prediction_id, model_version=1)
+        assert written.wait(2)
+        assert writes == [[1, 0, 0], [0, 0, 1]]
+
+        written.clear()
+        manager.save_prediction("another", "REAL", 0.8)
+        assert written.wait(2)
+        assert writes[-1] == [1, 0, 0]
+    finally:
+        manager.close()
+
+
+def test_rows_below_flush_rows_are_written_after_the_interval():
+    writes = []
+    manager, written = _manager(writes)
+    try:
+        start = time.monotonic()
+        manager.save_prediction("article", "FAKE", 0.9)
+        manager.save_feedback(1, True)
+        assert written.wait(2)
+        assert writes == [[1, 1, 0]]
+        assert time.monotonic() - start < 1
+    finally:
+        manager.close()